@@ -0,0 +1,217 @@
+"""
+Client Factory
+Shared, lazily constructed Groq and Upstash Vector clients on pooled
+keep-alive HTTP transports, with optional HTTP/2 and background warm-up.
+
+The SDKs' built-in retries are disabled: retry_policy.RetryPolicy owns every
+retry, so each attempt it logs and budgets is exactly one HTTP call.
+"""
+
+import importlib.util
+import os
+import threading
+import time
+from contextlib import contextmanager
+from types import MethodType
+from typing import Callable, Optional
+from config import env_bool, env_float, env_int
+
+# Connection pool settings (override via .env)
+HTTP_MAX_CONNECTIONS = env_int('HTTP_MAX_CONNECTIONS', 20)
+HTTP_MAX_KEEPALIVE = env_int('HTTP_MAX_KEEPALIVE', 10)
+HTTP_KEEPALIVE_EXPIRY = env_float('HTTP_KEEPALIVE_EXPIRY', 60.0)
+HTTP_CONNECT_TIMEOUT = env_float('HTTP_CONNECT_TIMEOUT', 10.0)
+HTTP2_ENABLED = env_bool('HTTP2_ENABLED', False)
+CLIENT_WARMUP = env_bool('CLIENT_WARMUP', True)
+
+# Default Upstash read timeout for bulk/admin calls (upsert, reset, info);
+# queries use vector_timeout() with what is left of VECTOR_DEADLINE instead
+VECTOR_ADMIN_TIMEOUT = env_float('VECTOR_ADMIN_TIMEOUT', 120.0)
+
+_lock = threading.Lock()
+_request_local = threading.local()
+_groq_client = None
+_vector_index = None
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (pip install httpx[http2])"""
+    return importlib.util.find_spec('h2') is not None
+
+
+def build_http_client(read_timeout: float = 600.0):
+    """
+    Build an httpx.Client with a tuned keep-alive pool
+
+    Args:
+        read_timeout: Read timeout in seconds (per-request timeouts still apply)
+
+    Returns:
+        httpx.Client shared by every request made through it
+    """
+    import httpx
+
+    http2 = HTTP2_ENABLED
+    if http2 and not http2_available():
+        print("⚠️ HTTP2_ENABLED is set but 'h2' is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(read_timeout, connect=HTTP_CONNECT_TIMEOUT)
+    )
+
+
+def get_groq_client():
+    """
+    Return the shared Groq client, constructing it on first use
+
+    Returns:
+        Groq client, or None if GROQ_API_KEY is missing or construction fails
+    """
+    global _groq_client
+    if _groq_client is not None:
+        return _groq_client
+
+    with _lock:
+        if _groq_client is None:
+            api_key = os.getenv('GROQ_API_KEY')
+            if not api_key:
+                print("❌ GROQ_API_KEY not found in .env file")
+                return None
+            try:
+                from groq import Groq
+                _groq_client = Groq(api_key=api_key, max_retries=0, http_client=build_http_client())
+            except Exception as e:
+                print(f"❌ Error initializing Groq client: {str(e)}")
+                return None
+    return _groq_client
+
+
+def get_vector_index():
+    """
+    Return the shared Upstash Vector index, constructing it on first use
+
+    No network call is made here; the first connection is opened by the
+    first query (or by warm_up()).
+
+    Returns:
+        upstash_vector.Index, or None if construction fails
+    """
+    global _vector_index
+    if _vector_index is not None:
+        return _vector_index
+
+    with _lock:
+        if _vector_index is None:
+            try:
+                from upstash_vector import Index
+                index = Index(
+                    os.environ['UPSTASH_VECTOR_REST_URL'],
+                    os.environ['UPSTASH_VECTOR_REST_TOKEN'],
+                    retries=0
+                )
+                # The SDK builds a default httpx.Client (600 s read timeout) and has
+                # no per-request timeout; swap in the pooled one and a request method
+                # that honours vector_timeout()
+                index._client.close()
+                index._client = build_http_client(read_timeout=VECTOR_ADMIN_TIMEOUT)
+                index._execute_request = MethodType(_execute_vector_request, index)
+                _vector_index = index
+            except Exception as e:
+                print(f"❌ Error connecting to vector database: {str(e)}")
+                return None
+    return _vector_index
+
+
+@contextmanager
+def vector_timeout(seconds: float):
+    """
+    Bound Upstash requests made by this thread inside the block to `seconds`
+
+    Usage:
+        with vector_timeout(deadline.remaining()):
+            index.query(...)
+    """
+    previous = getattr(_request_local, 'vector_timeout', None)
+    _request_local.vector_timeout = seconds
+    try:
+        yield
+    finally:
+        _request_local.vector_timeout = previous
+
+
+def _execute_vector_request(index, payload="", path=""):
+    """Index._execute_request with a per-request timeout (SDK retries are off)"""
+    import httpx
+    from upstash_vector.errors import UpstashError
+
+    seconds = getattr(_request_local, 'vector_timeout', None)
+    timeout = (httpx.Timeout(seconds, connect=min(HTTP_CONNECT_TIMEOUT, seconds))
+               if seconds is not None else httpx.USE_CLIENT_DEFAULT)
+    response = index._client.post(f"{index._url}{path}", headers=index._headers,
+                                  json=payload, timeout=timeout)
+    body = response.json()
+    if "error" in body:
+        raise UpstashError(body["error"])
+    return body["result"]
+
+
+def run_in_background(fn: Callable, name: str = "warmup") -> threading.Thread:
+    """Run `fn` on a daemon thread, printing (not raising) any error"""
+    def runner():
+        try:
+            fn()
+        except Exception as e:
+            print(f"⚠️ Background {name} failed: {str(e)}")
+
+    thread = threading.Thread(target=runner, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def warm_up(groq: bool = True, vector: bool = True, background: bool = True) -> Optional[threading.Thread]:
+    """
+    Construct clients and open their first connections ahead of the first question
+
+    Args:
+        groq: Pre-connect the Groq client (cheap authenticated models.list call)
+        vector: Pre-connect the Upstash Vector index (info call)
+        background: Run on a daemon thread instead of blocking
+
+    Returns:
+        The warm-up thread when background=True, otherwise None
+    """
+    def connect():
+        start_time = time.time()
+        if groq:
+            client = get_groq_client()
+            if client:
+                client.models.list()
+        if vector:
+            index = get_vector_index()
+            if index:
+                index.info()
+        print(f"🔥 Clients warmed up in {(time.time() - start_time) * 1000:.0f} ms")
+
+    if background:
+        return run_in_background(connect, name="client-warmup")
+    connect()
+    return None
+
+
+def close_clients():
+    """Close pooled connections (safe to call at exit)"""
+    global _groq_client, _vector_index
+    with _lock:
+        if _groq_client is not None:
+            _groq_client.close()
+            _groq_client = None
+        if _vector_index is not None:
+            _vector_index._client.close()
+            _vector_index = None
@@ -0,0 +1,29 @@
+"""
+Configuration
+Loads .env once and reads typed settings for modules configured at import time.
+
+Modules import their settings through these helpers instead of calling
+load_dotenv() themselves, so .env values apply whichever module is imported
+first.
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_str(name: str, default: str) -> str:
+    return os.getenv(name, default)
+
+
+def env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, 'true' if default else 'false').lower() == 'true'
@@ -8,11 +8,16 @@ Based on Binal's production implementation
 import os
 import json
 import time
+import argparse
 from dotenv import load_dotenv
-from upstash_vector import Index
-from groq import Groq
-from groq import RateLimitError, APIError, AuthenticationError
+from clients import CLIENT_WARMUP, get_groq_client, get_vector_index, run_in_background, vector_timeout, warm_up
 from groq_monitor import GroqUsageMonitor
+import metrics
+import profiling
+from prompts import build_prompt
+from query_router import DEEP_MODEL, FAST_MODEL, ROUTER_ENABLED, route_question
+from retry_policy import (GROQ_DEADLINE, VECTOR_DEADLINE, Deadline, RetryPolicy,
+                          get_groq_retry_policy, get_vector_retry_policy)
 
 # Load environment variables
 load_dotenv()
@@ -24,35 +29,48 @@ DEFAULT_MODEL = os.getenv('GROQ_MODEL', 'llama-3.1-8b-instant')
 GROQ_TEMPERATURE = float(os.getenv('GROQ_TEMPERATURE', '0.7'))
 GROQ_MAX_TOKENS = int(os.getenv('GROQ_MAX_TOKENS', '500'))
 GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', '30.0'))
+RAG_TOP_K = int(os.getenv('RAG_TOP_K', '3'))  # Tune with eval_retrieval.py
 
 # Initialize usage monitor
 usage_monitor = GroqUsageMonitor()
 
-def setup_groq_client():
-    """Setup Groq client"""
-    if not GROQ_API_KEY:
-        print("❌ GROQ_API_KEY not found in .env file")
-        return None
-    
-    try:
-        client = Groq(api_key=GROQ_API_KEY)
-        print("✅ Groq client initialized successfully!")
-        return client
-    except Exception as e:
-        print(f"❌ Error initializing Groq client: {str(e)}")
-        return None
+# Background profile check started by setup_vector_database(), and its result
+_vector_setup_thread = None
+_vector_setup_ok = None
+
 
 def setup_vector_database():
-    """Setup Upstash Vector database with built-in embeddings"""
+    """
+    Setup Upstash Vector database with built-in embeddings
+    
+    With CLIENT_WARMUP enabled the vector count check (and upload, if the
+    index is empty) runs in the background; query_vectors waits for it and
+    refuses to query if it failed.
+    """
+    global _vector_setup_thread
     print("🔄 Setting up Upstash Vector database...")
     
-    try:
-        index = Index.from_env()
-        print("✅ Connected to Upstash Vector successfully!")
+    index = get_vector_index()
+    if not index:
+        return None
+    
+    if CLIENT_WARMUP:
+        def background_setup():
+            global _vector_setup_ok
+            _vector_setup_ok = load_profile_if_empty(index)
         
+        _vector_setup_thread = run_in_background(background_setup, name="vector-setup")
+    elif not load_profile_if_empty(index):
+        return None
+    
+    return index
+
+def load_profile_if_empty(index):
+    """Upload the professional profile if the vector database is empty"""
+    try:
         # Check current vector count
         try:
-            info = index.info()
+            info = get_vector_retry_policy().call(index.info, operation="vector.info")
             current_count = getattr(info, 'vector_count', 0)
             print(f"📊 Current vectors in database: {current_count}")
         except:
@@ -67,7 +85,7 @@ def setup_vector_database():
                     profile_data = json.load(f)
             except FileNotFoundError:
                 print(f"❌ {JSON_FILE} not found!")
-                return None
+                return False
             
             # Prepare vectors from content chunks
             vectors = []
@@ -75,7 +93,7 @@ def setup_vector_database():
             
             if not content_chunks:
                 print("❌ No content chunks found in profile data")
-                return None
+                return False
             
             for chunk in content_chunks:
                 enriched_text = f"{chunk['title']}: {chunk['content']}"
@@ -92,146 +110,167 @@ def setup_vector_database():
                     }
                 ))
             
-            # Upload vectors
-            index.upsert(vectors=vectors)
+            # Upload vectors (upsert by id is idempotent, so it is safe to retry)
+            get_vector_retry_policy().call(lambda: index.upsert(vectors=vectors), operation="vector.upsert")
             print(f"✅ Successfully uploaded {len(vectors)} content chunks!")
         
-        return index
+        return True
         
     except Exception as e:
         print(f"❌ Error setting up database: {str(e)}")
-        return None
+        return False
 
 def query_vectors(index, query_text, top_k=3):
-    """Query Upstash Vector for similar vectors"""
+    """
+    Query Upstash Vector for similar vectors
+    
+    Raises RuntimeError if the background profile check/upload failed.
+    """
+    deadline = Deadline(VECTOR_DEADLINE)
+    if _vector_setup_thread is not None:
+        _vector_setup_thread.join(timeout=deadline.remaining())
+        if not _vector_setup_thread.is_alive() and not _vector_setup_ok:
+            raise RuntimeError("Vector database setup failed, your profile is not loaded. "
+                               f"Check {JSON_FILE} and your Upstash credentials, then restart.")
+    
+    def attempt():
+        if deadline.expired():
+            raise TimeoutError("Request deadline exceeded")
+        with vector_timeout(deadline.remaining()):
+            return index.query(
+                data=query_text,
+                top_k=top_k,
+                include_metadata=True
+            )
+    
     try:
-        results = index.query(
-            data=query_text,
-            top_k=top_k,
-            include_metadata=True
-        )
+        # End to end, including retries (each attempt is also timed separately)
+        with metrics.time_stage("vector.query"):
+            results = get_vector_retry_policy().call(
+                attempt,
+                operation="vector.query",
+                deadline=deadline,
+                monitor=usage_monitor
+            )
         return results
     except Exception as e:
         print(f"❌ Error querying vectors: {str(e)}")
         return None
 
-def generate_response_with_groq(client, prompt, model=DEFAULT_MODEL, max_retries=3, question=None):
-    """Generate response using Groq with enhanced error handling and retry logic"""
-    start_time = time.time()
+def generate_response_with_groq(client, prompt, model=DEFAULT_MODEL, max_retries=None, question=None,
+                                max_tokens=GROQ_MAX_TOKENS, route=None):
+    """
+    Generate response using Groq with deadline-aware retries
     
-    for attempt in range(max_retries):
-        try:
-            completion = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an AI digital twin. Answer questions as if you are the person, speaking in first person about your background, skills, and experience."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=GROQ_TEMPERATURE,
-                max_tokens=GROQ_MAX_TOKENS,
-                timeout=GROQ_TIMEOUT
-            )
-            
-            # Calculate latency
-            latency_ms = (time.time() - start_time) * 1000
-            
-            # Log token usage for monitoring
-            usage = completion.usage
-            if usage:
-                print(f"📊 Tokens: {usage.prompt_tokens} prompt + {usage.completion_tokens} completion = {usage.total_tokens} total")
-                
-                # Log to usage monitor
-                usage_monitor.log_request(
-                    model=model,
-                    prompt_tokens=usage.prompt_tokens,
-                    completion_tokens=usage.completion_tokens,
-                    latency_ms=latency_ms,
-                    question=question,
-                    success=True
-                )
-            
-            return completion.choices[0].message.content.strip()
-        
-        except RateLimitError as e:
-            latency_ms = (time.time() - start_time) * 1000
-            if attempt < max_retries - 1:
-                wait_time = (2 ** attempt) * 1  # Exponential backoff: 1s, 2s, 4s
-                print(f"⏳ Rate limit hit (attempt {attempt + 1}/{max_retries}), retrying in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                print(f"❌ Rate limit exceeded: {str(e)}")
-                usage_monitor.log_request(
-                    model=model, prompt_tokens=0, completion_tokens=0,
-                    latency_ms=latency_ms, question=question,
-                    success=False, error=f"Rate limit: {str(e)}"
-                )
-                return "❌ Service temporarily unavailable due to high demand. Please try again in a moment."
-        
-        except AuthenticationError as e:
-            latency_ms = (time.time() - start_time) * 1000
+    `max_retries` overrides RETRY_MAX_ATTEMPTS for this call; `route` is an
+    optional RouteDecision.to_dict(), logged with the request.
+    """
+    deadline = Deadline(GROQ_DEADLINE)
+    policy = get_groq_retry_policy()
+    if max_retries is not None and max_retries != policy.max_attempts:
+        policy = RetryPolicy(
+            max_attempts=max_retries,
+            retry_on=policy.retry_on,
+            give_up_on=policy.give_up_on
+        )
+    attempt_start = [time.time()]
+    
+    def attempt():
+        attempt_start[0] = time.time()
+        if deadline.expired():
+            raise TimeoutError("Request deadline exceeded")
+        return client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are an AI digital twin. Answer questions as if you are the person, speaking in first person about your background, skills, and experience."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=GROQ_TEMPERATURE,
+            max_tokens=max_tokens,
+            timeout=min(GROQ_TIMEOUT, deadline.remaining())
+        )
+    
+    try:
+        completion = policy.call(attempt, operation="groq.chat", deadline=deadline, monitor=usage_monitor)
+    except Exception as e:
+        from groq import RateLimitError, APIError, APITimeoutError, AuthenticationError
+        # Latency of the final attempt only; every attempt is logged separately
+        latency_ms = (time.time() - attempt_start[0]) * 1000
+        if isinstance(e, RateLimitError):
+            print(f"❌ Rate limit exceeded: {str(e)}")
+            error = f"Rate limit: {str(e)}"
+            message = "❌ Service temporarily unavailable due to high demand. Please try again in a moment."
+        elif isinstance(e, AuthenticationError):
             print(f"❌ Authentication error: {str(e)}")
-            usage_monitor.log_request(
-                model=model, prompt_tokens=0, completion_tokens=0,
-                latency_ms=latency_ms, question=question,
-                success=False, error=f"Auth error: {str(e)}"
-            )
-            return "❌ Configuration error: Invalid API credentials. Please check your GROQ_API_KEY."
-        
-        except APIError as e:
-            latency_ms = (time.time() - start_time) * 1000
+            error = f"Auth error: {str(e)}"
+            message = "❌ Configuration error: Invalid API credentials. Please check your GROQ_API_KEY."
+        elif isinstance(e, (TimeoutError, APITimeoutError)):
+            print(f"⏱️ Request timeout: {str(e)}")
+            error = "Timeout"
+            message = "⏱️ Request timeout: The AI service is taking too long to respond. Please try again."
+        elif isinstance(e, APIError):
             print(f"❌ Groq API error: {str(e)}")
-            if attempt < max_retries - 1:
-                wait_time = 2
-                print(f"⏳ Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                usage_monitor.log_request(
-                    model=model, prompt_tokens=0, completion_tokens=0,
-                    latency_ms=latency_ms, question=question,
-                    success=False, error=f"API error: {str(e)}"
-                )
-                return f"❌ Unable to generate response: {str(e)}. Please try again later."
+            error = f"API error: {str(e)}"
+            message = f"❌ Unable to generate response: {str(e)}. Please try again later."
+        else:
+            print(f"❌ Unexpected error: {type(e).__name__}: {str(e)}")
+            error = f"{type(e).__name__}: {str(e)}"
+            message = f"❌ An unexpected error occurred: {str(e)}"
         
-        except TimeoutError as e:
-            latency_ms = (time.time() - start_time) * 1000
-            print(f"⏱️ Request timeout: {str(e)}")
-            if attempt < max_retries - 1:
-                print(f"⏳ Retrying (attempt {attempt + 2}/{max_retries})...")
-            else:
-                usage_monitor.log_request(
-                    model=model, prompt_tokens=0, completion_tokens=0,
-                    latency_ms=latency_ms, question=question,
-                    success=False, error="Timeout"
-                )
-                return "⏱️ Request timeout: The AI service is taking too long to respond. Please try again."
+        usage_monitor.log_request(
+            model=model, prompt_tokens=0, completion_tokens=0,
+            latency_ms=latency_ms, question=question, route_decision=route,
+            success=False, error=error
+        )
+        return message
+    
+    # Latency of the successful attempt
+    latency_ms = (time.time() - attempt_start[0]) * 1000
+    
+    # Log token usage for monitoring
+    usage = completion.usage
+    if usage:
+        print(f"📊 Tokens: {usage.prompt_tokens} prompt + {usage.completion_tokens} completion = {usage.total_tokens} total")
         
-        except Exception as e:
-            latency_ms = (time.time() - start_time) * 1000
-            print(f"❌ Unexpected error: {type(e).__name__}: {str(e)}")
-            if attempt < max_retries - 1:
-                print(f"⏳ Retrying (attempt {attempt + 2}/{max_retries})...")
-                time.sleep(1)
-            else:
-                usage_monitor.log_request(
-                    model=model, prompt_tokens=0, completion_tokens=0,
-                    latency_ms=latency_ms, question=question,
-                    success=False, error=f"{type(e).__name__}: {str(e)}"
-                )
-                return f"❌ An unexpected error occurred: {str(e)}"
+        # Log to usage monitor
+        usage_monitor.log_request(
+            model=model,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            latency_ms=latency_ms,
+            question=question,
+            success=True,
+            route_decision=route
+        )
     
-    return "❌ Failed to generate response after multiple attempts. Please try again later."
+    return completion.choices[0].message.content.strip()
 
 def rag_query(index, groq_client, question):
-    """Perform RAG query using Upstash Vector + Groq"""
+    """
+    Perform RAG query using Upstash Vector + Groq
+    
+    Pass groq_client=None to use the shared client, constructed on first use.
+    Sampled queries are profiled when PROFILE_ENABLED is set.
+    """
+    metrics.INFLIGHT.inc()
+    try:
+        with metrics.time_stage("rag_query"), profiling.profile_query("rag_query", question=question):
+            return _rag_query(index, groq_client, question)
+    finally:
+        metrics.INFLIGHT.dec()
+
+def _rag_query(index, groq_client, question):
+    start_time = time.time()
     try:
         # Step 1: Query vector database
-        results = query_vectors(index, question, top_k=3)
+        with profiling.profile_stage("vector.query"):
+            results = query_vectors(index, question, top_k=RAG_TOP_K)
         
         if not results or len(results) == 0:
             return "I don't have specific information about that topic."
@@ -240,6 +279,7 @@ def rag_query(index, groq_client, question):
         print("🧠 Searching your professional profile...")
         
         top_docs = []
+        scores = []
         for result in results:
             metadata = result.metadata or {}
             title = metadata.get('title', 'Information')
@@ -249,25 +289,41 @@ def rag_query(index, groq_client, question):
             print(f"🔹 Found: {title} (Relevance: {score:.3f})")
             if content:
                 top_docs.append(f"{title}: {content}")
+                scores.append(score)
         
         if not top_docs:
             return "I found some information but couldn't extract details."
         
+        # Step 3: Pick model tier and output budget for this question
+        with profiling.profile_stage("route"):
+            route = route_question(question, scores)
+        print(f"🧭 Route: {route.tier} → {route.model or 'no LLM'} ({route.reason})")
+        
+        if route.skip_llm:
+            best = max((r for r in results if (r.metadata or {}).get('content')), key=lambda r: r.score)
+            usage_monitor.log_direct_answer(
+                latency_ms=(time.time() - start_time) * 1000,
+                top_score=best.score,
+                question=question,
+                route_decision=route.to_dict()
+            )
+            return (best.metadata or {}).get('content', '')
+        
+        groq_client = groq_client or get_groq_client()
+        if not groq_client:
+            return "❌ Configuration error: Groq client unavailable. Please check your GROQ_API_KEY."
+        
         print(f"⚡ Generating personalized response...")
         
-        # Step 3: Generate response with context
-        context = "\n\n".join(top_docs)
-        prompt = f"""Based on the following information about yourself, answer the question.
-Speak in first person as if you are describing your own background.
-
-Your Information:
-{context}
-
-Question: {question}
-
-Provide a helpful, professional response:"""
+        # Step 4: Generate response with context
+        with metrics.time_stage("prompt.build"), profiling.profile_stage("prompt.build"):
+            prompt = build_prompt(question, top_docs)
         
-        response = generate_response_with_groq(groq_client, prompt, question=question)
+        with profiling.profile_stage("groq.generate"):
+            response = generate_response_with_groq(
+                groq_client, prompt, model=route.model, question=question,
+                max_tokens=route.max_tokens, route=route.to_dict()
+            )
         return response
     
     except Exception as e:
@@ -275,21 +331,39 @@ Provide a helpful, professional response:"""
 
 def main():
     """Main application loop"""
+    parser = argparse.ArgumentParser(description="Chat with your AI Digital Twin")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile sampled queries with cProfile + tracemalloc")
+    parser.add_argument("--profile-rate", type=float,
+                        help="Fraction of queries to profile (default: PROFILE_SAMPLE_RATE)")
+    parser.add_argument("--profile-dir", help="Where to write profiles (default: PROFILE_DIR)")
+    args = parser.parse_args()
+    # Rate/dir also apply when profiling is switched on via PROFILE_ENABLED
+    profiling.configure(enabled=True if args.profile else None,
+                        sample_rate=args.profile_rate, output_dir=args.profile_dir)
+    
     print("🤖 Your Digital Twin - AI Profile Assistant")
     print("=" * 50)
     print("🔗 Vector Storage: Upstash (built-in embeddings)")
     print(f"⚡ AI Inference: Groq ({DEFAULT_MODEL})")
+    if ROUTER_ENABLED:
+        print(f"🧭 Router: fast {FAST_MODEL} | standard {DEFAULT_MODEL} | deep {DEEP_MODEL}")
     print("📋 Data Source: Your Professional Profile\n")
     
-    # Setup clients
-    groq_client = setup_groq_client()
-    if not groq_client:
+    # Setup clients (Groq is constructed lazily; warm-up pre-connects it in the background)
+    if not GROQ_API_KEY:
+        print("❌ GROQ_API_KEY not found in .env file")
         return
     
     index = setup_vector_database()
     if not index:
         return
     
+    if CLIENT_WARMUP:
+        warm_up(vector=False)
+    
+    metrics.start_exporters()
+    
     print("✅ Your Digital Twin is ready!\n")
     
     # Interactive chat loop
@@ -312,7 +386,7 @@ def main():
             break
         
         if question.strip():
-            answer = rag_query(index, groq_client, question)
+            answer = rag_query(index, None, question)
             print(f"🤖 Digital Twin: {answer}\n")
 
 if __name__ == "__main__":
@@ -0,0 +1,354 @@
+"""
+Retrieval Evaluation
+Compare retrieval configurations on a labeled question set over digitaltwin.json:
+recall@k, MRR, retrieval latency percentiles and resulting prompt token counts.
+
+Backends:
+  - upstash: Upstash Vector index, the path rag_query uses (default)
+  - lexical: local BM25 over content_chunks (no network)
+  - hybrid:  reciprocal rank fusion of lexical + upstash
+
+Configs that fail to run (e.g. Upstash unreachable) fail the --baseline gate,
+as do baseline configs missing from the run.
+
+Usage:
+    python eval_retrieval.py                                  # upstash, top_k 1/3/5
+    python eval_retrieval.py --backend lexical                # offline
+    python eval_retrieval.py --backend lexical upstash hybrid --rerank off on
+    python eval_retrieval.py --token-budget 0 300 --output retrieval_eval_results.json
+    python eval_retrieval.py --baseline retrieval_eval_results.json   # gate on quality + cost
+"""
+
+import argparse
+import itertools
+import json
+import math
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+from prompts import build_prompt
+
+EVAL_SET_FILE = "retrieval_eval_set.json"
+DATASET_FILE = "digitaltwin.json"  # used when the eval set names no dataset
+CHARS_PER_TOKEN = 4  # Rough estimate for Llama-family tokenizers on English text
+RRF_K = 60
+RERANK_CANDIDATES = 10
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "for", "have", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "so", "that", "the", "to",
+    "what", "when", "where", "which", "who", "with", "you", "your", "about", "tell"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count (no tokenizer dependency)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def chunk_document(chunk: Dict) -> str:
+    """Same "title: content" text that rag_query puts in the prompt"""
+    return f"{chunk['title']}: {chunk['content']}"
+
+
+@dataclass
+class RetrievalConfig:
+    """One retrieval configuration to evaluate"""
+    backend: str
+    top_k: int
+    rerank: bool = False
+    token_budget: int = 0  # Max context tokens; 0 = unlimited
+
+    @property
+    def name(self) -> str:
+        parts = [self.backend, f"k{self.top_k}"]
+        if self.rerank:
+            parts.append("rerank")
+        if self.token_budget:
+            parts.append(f"budget{self.token_budget}")
+        return "/".join(parts)
+
+
+class LexicalIndex:
+    """BM25 over content chunks (title, tags and content)"""
+
+    def __init__(self, chunks: List[Dict], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = [chunk['id'] for chunk in chunks]
+        self.docs = [
+            Counter(tokenize(" ".join([
+                chunk['title'], chunk['content'],
+                " ".join(chunk.get('metadata', {}).get('tags', []))
+            ])))
+            for chunk in chunks
+        ]
+        self.lengths = [sum(doc.values()) for doc in self.docs]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        document_frequency = Counter(term for doc in self.docs for term in doc)
+        n = len(self.docs)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def search(self, question: str, top_k: int) -> List[Tuple[str, float]]:
+        terms = tokenize(question)
+        scored = []
+        for chunk_id, doc, length in zip(self.ids, self.docs, self.lengths):
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term, 0)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * length / self.avg_length)
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((chunk_id, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:top_k]
+
+
+def upstash_search(question: str, top_k: int) -> List[Tuple[str, float]]:
+    from clients import get_vector_index
+
+    index = get_vector_index()
+    if index is None:
+        raise RuntimeError("Upstash Vector index unavailable (check UPSTASH_VECTOR_REST_URL / TOKEN)")
+    results = index.query(data=question, top_k=top_k, include_metadata=False)
+    return [(result.id, result.score) for result in results]
+
+
+def fuse(rankings: List[List[Tuple[str, float]]], top_k: int) -> List[Tuple[str, float]]:
+    """Reciprocal rank fusion"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, (chunk_id, _) in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+def rerank(question: str, candidates: List[Tuple[str, float]], chunks_by_id: Dict[str, Dict],
+           top_k: int) -> List[Tuple[str, float]]:
+    """
+    Cheap local reranker: question-term overlap with title and tags (weighted),
+    then content, with the first-stage rank as a tie-breaker
+    """
+    terms = set(tokenize(question))
+    rescored = []
+    for rank, (chunk_id, _) in enumerate(candidates):
+        chunk = chunks_by_id[chunk_id]
+        header = set(tokenize(chunk['title'] + " " + " ".join(chunk.get('metadata', {}).get('tags', []))))
+        body = set(tokenize(chunk['content']))
+        score = 2.0 * len(terms & header) + len(terms & body) + 1.0 / (rank + 1)
+        rescored.append((chunk_id, score))
+    rescored.sort(key=lambda item: item[1], reverse=True)
+    return rescored[:top_k]
+
+
+class Retriever:
+    """Runs one RetrievalConfig and applies the context token budget"""
+
+    def __init__(self, chunks: List[Dict]):
+        self.chunks_by_id = {chunk['id']: chunk for chunk in chunks}
+        self.lexical = LexicalIndex(chunks)
+
+    def search(self, config: RetrievalConfig, question: str) -> List[str]:
+        fetch_k = max(config.top_k, RERANK_CANDIDATES) if config.rerank else config.top_k
+
+        if config.backend == "lexical":
+            ranking = self.lexical.search(question, fetch_k)
+        elif config.backend == "upstash":
+            ranking = upstash_search(question, fetch_k)
+        elif config.backend == "hybrid":
+            ranking = fuse([self.lexical.search(question, fetch_k),
+                            upstash_search(question, fetch_k)], fetch_k)
+        else:
+            raise ValueError(f"Unknown backend: {config.backend}")
+
+        if config.rerank:
+            ranking = rerank(question, ranking, self.chunks_by_id, config.top_k)
+
+        chunk_ids = [chunk_id for chunk_id, _ in ranking[:config.top_k] if chunk_id in self.chunks_by_id]
+        return self.apply_token_budget(chunk_ids, config.token_budget)
+
+    def apply_token_budget(self, chunk_ids: List[str], token_budget: int) -> List[str]:
+        """Keep chunks in rank order while the context fits the budget (always keep one)"""
+        if not token_budget:
+            return chunk_ids
+        kept, used = [], 0
+        for chunk_id in chunk_ids:
+            tokens = estimate_tokens(chunk_document(self.chunks_by_id[chunk_id]))
+            if kept and used + tokens > token_budget:
+                break
+            kept.append(chunk_id)
+            used += tokens
+        return kept
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def evaluate(retriever: Retriever, config: RetrievalConfig, questions: List[Dict]) -> Dict:
+    """Run one configuration over the labeled set"""
+    recalls, reciprocal_ranks, latencies_ms, prompt_tokens = [], [], [], []
+    misses = []
+
+    for item in questions:
+        question, expected = item['question'], set(item['expected'])
+
+        start_time = time.perf_counter()
+        retrieved = retriever.search(config, question)
+        latencies_ms.append((time.perf_counter() - start_time) * 1000)
+
+        hits = expected & set(retrieved)
+        recalls.append(len(hits) / len(expected))
+        first_hit = next((rank for rank, chunk_id in enumerate(retrieved, 1) if chunk_id in expected), None)
+        reciprocal_ranks.append(1.0 / first_hit if first_hit else 0.0)
+        if not hits:
+            misses.append({"question": question, "expected": sorted(expected), "retrieved": retrieved})
+
+        docs = [chunk_document(retriever.chunks_by_id[chunk_id]) for chunk_id in retrieved]
+        prompt_tokens.append(estimate_tokens(build_prompt(question, docs)))
+
+    return {
+        "config": config.name,
+        "settings": asdict(config),
+        "questions": len(questions),
+        "recall_at_k": round(statistics.mean(recalls), 4),
+        "mrr": round(statistics.mean(reciprocal_ranks), 4),
+        "latency_p50_ms": round(percentile(latencies_ms, 50), 3),
+        "latency_p90_ms": round(percentile(latencies_ms, 90), 3),
+        "latency_p99_ms": round(percentile(latencies_ms, 99), 3),
+        "avg_prompt_tokens": round(statistics.mean(prompt_tokens), 1),
+        "max_prompt_tokens": max(prompt_tokens),
+        "misses": misses
+    }
+
+
+def print_table(results: List[Dict]):
+    """Print a comparison table of evaluated configurations"""
+    print("\n" + "=" * 96)
+    print(f"{'Config':<30} {'Recall@k':>9} {'MRR':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'Avg tok':>8} {'Max tok':>8}")
+    print("-" * 96)
+    for r in results:
+        print(f"{r['config']:<30} {r['recall_at_k']:>9.3f} {r['mrr']:>7.3f} "
+              f"{r['latency_p50_ms']:>9.2f} {r['latency_p90_ms']:>9.2f} {r['latency_p99_ms']:>9.2f} "
+              f"{r['avg_prompt_tokens']:>8.1f} {r['max_prompt_tokens']:>8,}")
+    print("=" * 96 + "\n")
+
+
+def check_gate(results: List[Dict], baseline: Dict, max_recall_drop: float,
+               max_token_increase: float, skipped: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Compare results with a baseline results file
+
+    Args:
+        skipped: Config name -> error for configs that failed to run
+
+    Returns:
+        Failure messages for configs that failed to run, baseline configs with
+        no result, and configs whose recall dropped or prompt tokens grew too much
+    """
+    baseline_by_config = {r['config']: r for r in baseline.get('results', [])}
+    result_configs = {r['config'] for r in results}
+    failures = [f"{name}: not evaluated ({error})" for name, error in (skipped or {}).items()]
+    failures.extend(f"{name}: in baseline but missing from this run"
+                    for name in baseline_by_config
+                    if name not in result_configs and name not in (skipped or {}))
+    if not results:
+        failures.append("no configuration was evaluated")
+    for r in results:
+        base = baseline_by_config.get(r['config'])
+        if not base:
+            continue
+        if base['recall_at_k'] - r['recall_at_k'] > max_recall_drop:
+            failures.append(f"{r['config']}: recall@k {base['recall_at_k']:.3f} -> {r['recall_at_k']:.3f}")
+        if base['avg_prompt_tokens'] and \
+                (r['avg_prompt_tokens'] - base['avg_prompt_tokens']) / base['avg_prompt_tokens'] > max_token_increase:
+            failures.append(f"{r['config']}: avg prompt tokens {base['avg_prompt_tokens']:.1f} -> {r['avg_prompt_tokens']:.1f}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval configurations: recall@k vs latency and token cost")
+    parser.add_argument("--eval-set", default=EVAL_SET_FILE, help="Labeled question -> expected chunk ids file")
+    parser.add_argument("--backend", nargs="+", default=["upstash"], choices=["upstash", "lexical", "hybrid"],
+                        help="Retrieval backends (default: upstash, as used by rag_query)")
+    parser.add_argument("--top-k", nargs="+", type=int, default=[1, 3, 5])
+    parser.add_argument("--rerank", nargs="+", default=["off"], choices=["off", "on"])
+    parser.add_argument("--token-budget", nargs="+", type=int, default=[0],
+                        help="Max context tokens per prompt (0 = unlimited)")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Fail if results regress against this results file")
+    parser.add_argument("--max-recall-drop", type=float, default=0.02)
+    parser.add_argument("--max-token-increase", type=float, default=0.10,
+                        help="Allowed relative growth in avg prompt tokens")
+    args = parser.parse_args()
+
+    with open(args.eval_set, "r", encoding="utf-8") as f:
+        eval_set = json.load(f)
+    with open(eval_set.get("dataset", DATASET_FILE), "r", encoding="utf-8") as f:
+        chunks = json.load(f).get("content_chunks", [])
+
+    retriever = Retriever(chunks)
+    questions = eval_set["questions"]
+    unknown = {cid for q in questions for cid in q["expected"]} - set(retriever.chunks_by_id)
+    if unknown:
+        print(f"❌ Eval set references unknown chunk ids: {sorted(unknown)}")
+        sys.exit(2)
+
+    print("📏 Retrieval Evaluation")
+    print(f"📋 {len(questions)} labeled questions over {len(chunks)} chunks")
+
+    results = []
+    skipped: Dict[str, str] = {}
+    for backend, top_k, rerank_flag, budget in itertools.product(
+            args.backend, args.top_k, args.rerank, args.token_budget):
+        config = RetrievalConfig(backend=backend, top_k=top_k, rerank=rerank_flag == "on", token_budget=budget)
+        try:
+            results.append(evaluate(retriever, config, questions))
+        except Exception as e:
+            print(f"⚠️ Skipping {config.name}: {str(e)}")
+            skipped[config.name] = str(e)
+
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "eval_set": args.eval_set,
+                "chars_per_token": CHARS_PER_TOKEN,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+                "skipped": skipped
+            }, f, indent=2)
+        print(f"💾 Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        failures = check_gate(results, baseline, args.max_recall_drop, args.max_token_increase, skipped)
+        if failures:
+            print("❌ Retrieval gate failed:")
+            for failure in failures:
+                print(f"  - {failure}")
+            sys.exit(1)
+        print("✅ Retrieval gate passed")
+
+
+if __name__ == "__main__":
+    main()
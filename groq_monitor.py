@@ -3,41 +3,184 @@ Groq Usage Monitor
 Track token usage, request counts, latency, and estimated costs for Groq API calls.
 """
 
+import atexit
 import json
-from datetime import datetime
+import time
 from pathlib import Path
 from typing import Dict, List, Optional
+from config import env_int, env_str
+from metrics import ATTEMPTS, ERRORS, REQUESTS, STAGE_LATENCY, TOKENS
+from profiling import profile_stage
+from usage_history import ColumnarHistory, epoch_to_iso, iso_to_epoch, load_histories, save_histories
+
+# Binary usage history file (the benchmark points this at a scratch file)
+USAGE_FILE = env_str('GROQ_USAGE_FILE', 'groq_usage.bin')
+
+# Number of most recent requests / attempts / direct answers kept in memory and on disk
+HISTORY_CAPACITY = env_int('GROQ_HISTORY_CAPACITY', 1000)
+
+# Attempt records are saved with the next request, or after this many unsaved attempts
+ATTEMPT_FLUSH_EVERY = env_int('GROQ_ATTEMPT_FLUSH_EVERY', 50)
+
+REQUEST_SCHEMA = [
+    ("timestamp", 'd'),
+    ("model", 'str'),
+    ("prompt_tokens", 'i'),
+    ("completion_tokens", 'i'),
+    ("latency_ms", 'f'),
+    ("success", 'b'),
+    ("route", 'str'),
+    ("route_reason", 'str'),
+    ("top_score", 'f'),
+    ("score_gap", 'f'),
+    ("complexity", 'i'),
+    ("error_type", 'str'),
+    ("error", 'text'),
+    ("question_preview", 'text'),
+]
+ATTEMPT_SCHEMA = [
+    ("timestamp", 'd'),
+    ("operation", 'str'),
+    ("attempt", 'i'),
+    ("latency_ms", 'f'),
+    ("outcome", 'str'),
+    ("error_type", 'str'),
+    ("error", 'text'),
+    ("wait_s", 'f'),
+]
+DIRECT_ANSWER_SCHEMA = [
+    ("timestamp", 'd'),
+    ("latency_ms", 'f'),
+    ("top_score", 'f'),
+    ("score_gap", 'f'),
+    ("complexity", 'i'),
+    ("route_reason", 'str'),
+    ("question_preview", 'text'),
+]
+
+
+def _error_type(error: Optional[str]) -> Optional[str]:
+    """Interned error category, e.g. 'Rate limit' from 'Rate limit: ...'"""
+    return error.split(":")[0] if error else None
+
+
+def _decision_columns(route_decision: Optional[Dict]) -> Dict:
+    """History columns for a RouteDecision.to_dict() (empty when not routed)"""
+    if not route_decision:
+        return {}
+    return {
+        "route_reason": route_decision.get("reason"),
+        "top_score": route_decision.get("top_score", 0.0),
+        "score_gap": route_decision.get("score_gap", 0.0),
+        "complexity": route_decision.get("complexity", 0)
+    }
+
+
+def _decision_dict(record: Dict) -> Optional[Dict]:
+    """Routing decision fields of a history record (None when not routed)"""
+    if not record["route_reason"]:
+        return None
+    return {
+        "reason": record["route_reason"],
+        "top_score": round(record["top_score"], 4),
+        "score_gap": round(record["score_gap"], 4),
+        "complexity": record["complexity"]
+    }
 
 
 class GroqUsageMonitor:
     """Monitor and log Groq API usage for cost tracking and optimization"""
     
-    def __init__(self, log_file: str = "groq_usage.json"):
-        self.log_file = Path(log_file)
-        self.usage_data = self._load_usage()
+    def __init__(self, log_file: str = USAGE_FILE, history_capacity: int = HISTORY_CAPACITY):
+        """
+        Args:
+            log_file: Binary usage file. A '.json' path is treated as the legacy
+                format: it is imported and written alongside as '.bin' by the
+                first save.
+            history_capacity: Ring buffer size for each history (at least 1)
+        """
+        log_file = Path(log_file)
+        if log_file.suffix == ".json":
+            self.legacy_file = log_file
+            log_file = log_file.with_suffix(".bin")
+        else:
+            self.legacy_file = log_file.with_suffix(".json")
+        self.log_file = log_file
+        
+        self.requests = ColumnarHistory(REQUEST_SCHEMA, history_capacity)
+        self.attempts = ColumnarHistory(ATTEMPT_SCHEMA, history_capacity)
+        self.direct_answers = ColumnarHistory(DIRECT_ANSWER_SCHEMA, history_capacity)
+        self._unsaved_attempts = 0
+        self.totals = self._load_usage()
+        
+        # Attempts logged after the last request would otherwise be lost at exit
+        atexit.register(self.flush)
+    
+    @property
+    def _histories(self) -> Dict[str, ColumnarHistory]:
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "direct_answers": self.direct_answers
+        }
     
     def _load_usage(self) -> Dict:
-        """Load existing usage data from file"""
+        """Load existing usage data from file (or import a legacy JSON log)"""
         if self.log_file.exists():
             try:
-                with open(self.log_file, 'r') as f:
-                    return json.load(f)
+                return {**self._init_totals(), **load_histories(self.log_file, self._histories)}
+            except (ValueError, KeyError, TypeError, IOError) as e:
+                print(f"⚠️ Warning: Could not load usage data: {e}")
+                return self._init_totals()
+        
+        if self.legacy_file.exists():
+            try:
+                with open(self.legacy_file, 'r') as f:
+                    totals = self._import_legacy(json.load(f))
             except (json.JSONDecodeError, IOError) as e:
                 print(f"⚠️ Warning: Could not load usage data: {e}")
-                return self._init_usage_data()
-        return self._init_usage_data()
+                return self._init_totals()
+            # Written as log_file by the first save, not at import time
+            return totals
+        return self._init_totals()
     
-    def _init_usage_data(self) -> Dict:
-        """Initialize empty usage data structure"""
+    def _init_totals(self) -> Dict:
+        """Initialize empty usage totals"""
         return {
             "total_requests": 0,
             "total_tokens": 0,
             "total_prompt_tokens": 0,
             "total_completion_tokens": 0,
-            "total_latency_ms": 0,
-            "requests": []
+            "total_latency_ms": 0
         }
     
+    def _import_legacy(self, usage_data: Dict) -> Dict:
+        """Load the old list-of-dicts JSON layout into the columnar histories"""
+        for r in usage_data.get("requests", []):
+            self.requests.append(
+                timestamp=iso_to_epoch(r.get("timestamp")), model=r.get("model"),
+                prompt_tokens=r.get("prompt_tokens", 0), completion_tokens=r.get("completion_tokens", 0),
+                latency_ms=r.get("latency_ms", 0.0), success=r.get("success", True),
+                route=r.get("route"), error_type=_error_type(r.get("error")), error=r.get("error"),
+                question_preview=r.get("question_preview"), **_decision_columns(r.get("route_decision"))
+            )
+        for a in usage_data.get("attempts", []):
+            self.attempts.append(
+                timestamp=iso_to_epoch(a.get("timestamp")), operation=a.get("operation"),
+                attempt=a.get("attempt", 1), latency_ms=a.get("latency_ms", 0.0),
+                outcome=a.get("outcome"), error_type=_error_type(a.get("error")),
+                error=a.get("error"), wait_s=a.get("wait_s")
+            )
+        for d in usage_data.get("direct_answers", []):
+            self.direct_answers.append(
+                timestamp=iso_to_epoch(d.get("timestamp")), latency_ms=d.get("latency_ms", 0.0),
+                question_preview=d.get("question_preview"),
+                **{**_decision_columns(d.get("route_decision")), "top_score": d.get("top_score", 0.0)}
+            )
+        totals = self._init_totals()
+        totals.update({key: usage_data.get(key, 0) for key in totals})
+        return totals
+    
     def log_request(
         self,
         model: str,
@@ -46,7 +189,9 @@ class GroqUsageMonitor:
         latency_ms: float,
         question: Optional[str] = None,
         success: bool = True,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        route: Optional[str] = None,
+        route_decision: Optional[Dict] = None
     ) -> Dict:
         """
         Log a single Groq API request
@@ -59,52 +204,270 @@ class GroqUsageMonitor:
             question: Optional question text (truncated for privacy)
             success: Whether request succeeded
             error: Error message if request failed
+            route: Optional routing tier chosen by the query router
+            route_decision: Optional RouteDecision.to_dict(); its reason, scores
+                and complexity are stored with the request for router tuning
         
         Returns:
             Dict with request details
         """
         total_tokens = prompt_tokens + completion_tokens
+        if route_decision and not route:
+            route = route_decision.get("tier")
+        now = time.time()
+        question_preview = question[:50] + "..." if question and len(question) > 50 else question
         
         request_data = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": epoch_to_iso(now),
             "model": model,
             "prompt_tokens": prompt_tokens,
             "completion_tokens": completion_tokens,
             "total_tokens": total_tokens,
             "latency_ms": round(latency_ms, 2),
             "success": success,
-            "question_preview": question[:50] + "..." if question and len(question) > 50 else question,
+            "question_preview": question_preview,
             "error": error
         }
+        if route:
+            request_data["route"] = route
+        if route_decision:
+            request_data["route_decision"] = route_decision
         
-        # Update totals
+        # Update in-process metrics
+        status = "success" if success else "error"
+        REQUESTS.labels(model=model, route=route or "", status=status).inc()
+        STAGE_LATENCY.labels(stage="groq.generate", model=model, status=status).observe(latency_ms / 1000)
         if success:
-            self.usage_data["total_requests"] += 1
-            self.usage_data["total_tokens"] += total_tokens
-            self.usage_data["total_prompt_tokens"] += prompt_tokens
-            self.usage_data["total_completion_tokens"] += completion_tokens
-            self.usage_data["total_latency_ms"] += latency_ms
+            TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens)
+            TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
         
-        # Add to request log
-        self.usage_data["requests"].append(request_data)
+        # Update totals
+        if success:
+            self.totals["total_requests"] += 1
+            self.totals["total_tokens"] += total_tokens
+            self.totals["total_prompt_tokens"] += prompt_tokens
+            self.totals["total_completion_tokens"] += completion_tokens
+            self.totals["total_latency_ms"] += latency_ms
         
-        # Keep only last 1000 requests to prevent file bloat
-        if len(self.usage_data["requests"]) > 1000:
-            self.usage_data["requests"] = self.usage_data["requests"][-1000:]
+        # Add to request log (ring buffer keeps the most recent HISTORY_CAPACITY)
+        self.requests.append(
+            timestamp=now, model=model, prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens, latency_ms=latency_ms, success=success,
+            route=route, error_type=_error_type(error), error=error,
+            question_preview=question_preview, **_decision_columns(route_decision)
+        )
         
         # Save to file
         self._save_usage()
         
         return request_data
     
+    def log_direct_answer(
+        self,
+        latency_ms: float,
+        top_score: float,
+        question: Optional[str] = None,
+        route_decision: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Log a question answered straight from a retrieved chunk (no Groq call)
+        
+        Args:
+            latency_ms: End-to-end latency in milliseconds
+            top_score: Retrieval score of the chunk used as the answer
+            question: Optional question text (truncated for privacy)
+            route_decision: Optional RouteDecision.to_dict() that chose the direct tier
+        
+        Returns:
+            Dict with answer details
+        """
+        now = time.time()
+        answer_data = {
+            "timestamp": epoch_to_iso(now),
+            "route": "direct",
+            "latency_ms": round(latency_ms, 2),
+            "top_score": round(top_score, 4),
+            "question_preview": question[:50] + "..." if question and len(question) > 50 else question
+        }
+        if route_decision:
+            answer_data["route_decision"] = route_decision
+        
+        REQUESTS.labels(model="", route="direct", status="success").inc()
+        
+        self.direct_answers.append(
+            timestamp=now, latency_ms=latency_ms, question_preview=answer_data["question_preview"],
+            **{**_decision_columns(route_decision), "top_score": top_score}
+        )
+        
+        self._save_usage()
+        
+        return answer_data
+    
+    def log_attempt(
+        self,
+        operation: str,
+        attempt: int,
+        latency_ms: float,
+        outcome: str,
+        error: Optional[str] = None,
+        wait_s: Optional[float] = None
+    ) -> Dict:
+        """
+        Log a single attempt made by a RetryPolicy
+        
+        Args:
+            operation: Operation label (e.g., 'groq.chat', 'vector.query')
+            attempt: 1-based attempt number
+            latency_ms: Latency of this attempt only, in milliseconds
+            outcome: 'success', 'retry' or 'failed'
+            error: Error message if the attempt failed
+            wait_s: Backoff before the next attempt, if retrying
+        
+        Returns:
+            Dict with attempt details
+        """
+        now = time.time()
+        attempt_data = {
+            "timestamp": epoch_to_iso(now),
+            "operation": operation,
+            "attempt": attempt,
+            "latency_ms": round(latency_ms, 2),
+            "outcome": outcome,
+            "error": error,
+            "wait_s": round(wait_s, 3) if wait_s is not None else None
+        }
+        
+        ATTEMPTS.labels(operation=operation, outcome=outcome).inc()
+        STAGE_LATENCY.labels(stage=f"{operation}.attempt", model="", status=outcome).observe(latency_ms / 1000)
+        if error:
+            ERRORS.labels(operation=operation, type=error.split(":")[0]).inc()
+        
+        self.attempts.append(
+            timestamp=now, operation=operation, attempt=attempt, latency_ms=latency_ms,
+            outcome=outcome, error_type=_error_type(error), error=error, wait_s=wait_s
+        )
+        
+        # Not saved per attempt (hot path): the next log_request / log_direct_answer
+        # save includes it, and long runs of attempts are flushed in batches
+        self._unsaved_attempts += 1
+        if self._unsaved_attempts >= ATTEMPT_FLUSH_EVERY:
+            self._save_usage()
+        
+        return attempt_data
+    
+    def get_attempt_summary(self) -> Dict:
+        """
+        Get per-operation attempt outcomes from retry policies
+        
+        Returns:
+            Dict mapping operation to attempt counts, retries and avg attempt latency
+        """
+        summary: Dict[str, Dict] = {}
+        for operation, outcome, latency_ms in zip(
+                self.attempts.strings("operation"),
+                self.attempts.strings("outcome"),
+                self.attempts.column("latency_ms")):
+            stats = summary.setdefault(operation, {
+                "attempts": 0, "success": 0, "retry": 0, "failed": 0, "total_latency_ms": 0.0
+            })
+            stats["attempts"] += 1
+            stats[outcome] = stats.get(outcome, 0) + 1
+            stats["total_latency_ms"] += latency_ms
+        
+        for stats in summary.values():
+            stats["avg_attempt_latency_ms"] = round(stats.pop("total_latency_ms") / stats["attempts"], 2)
+        return summary
+    
+    def get_route_summary(self) -> Dict:
+        """
+        Get per-tier outcomes of routing decisions for tuning the router policy
+        
+        Returns:
+            Dict mapping route tier to count, avg latency, avg tokens, success rate,
+            and the avg retrieval top score / complexity that led to the tier
+        """
+        # route -> [count, total latency, total tokens, successes, total top score, total complexity]
+        buckets: Dict[str, List[float]] = {}
+        for route, latency_ms, prompt_tokens, completion_tokens, success, top_score, complexity in zip(
+                self.requests.strings("route"),
+                self.requests.column("latency_ms"),
+                self.requests.column("prompt_tokens"),
+                self.requests.column("completion_tokens"),
+                self.requests.column("success"),
+                self.requests.column("top_score"),
+                self.requests.column("complexity")):
+            if route:
+                bucket = buckets.setdefault(route, [0, 0.0, 0, 0, 0.0, 0])
+                bucket[0] += 1
+                bucket[1] += latency_ms
+                bucket[2] += prompt_tokens + completion_tokens
+                bucket[3] += success
+                bucket[4] += top_score
+                bucket[5] += complexity
+        if len(self.direct_answers):
+            latencies = self.direct_answers.column("latency_ms")
+            buckets["direct"] = [len(latencies), sum(latencies), 0, len(latencies),
+                                 sum(self.direct_answers.column("top_score")),
+                                 sum(self.direct_answers.column("complexity"))]
+        
+        summary = {}
+        for route, (count, total_latency, total_tokens, successes, total_score, total_complexity) in buckets.items():
+            summary[route] = {
+                "count": count,
+                "avg_latency_ms": round(total_latency / count, 2),
+                "avg_tokens": round(total_tokens / count, 2),
+                "success_rate_percent": round(successes / count * 100, 2),
+                "avg_top_score": round(total_score / count, 4),
+                "avg_complexity": round(total_complexity / count, 2)
+            }
+        return summary
+    
+    def get_window_stats(self, seconds: float = 3600) -> Dict:
+        """
+        Get request statistics for a recent time window
+        
+        Args:
+            seconds: Window length, counted back from now
+        
+        Returns:
+            Dict with request count, tokens, latency percentiles and success rate
+        """
+        count = self.requests.since(time.time() - seconds)
+        if count == 0:
+            return {"window_s": seconds, "requests": 0}
+        
+        latencies = sorted(self.requests.column("latency_ms", count))
+        prompt_tokens = sum(self.requests.column("prompt_tokens", count))
+        completion_tokens = sum(self.requests.column("completion_tokens", count))
+        successes = sum(self.requests.column("success", count))
+        
+        def percentile(pct: float) -> float:
+            return latencies[min(count - 1, int(pct / 100 * count))]
+        
+        return {
+            "window_s": seconds,
+            "requests": count,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "avg_latency_ms": round(sum(latencies) / count, 2),
+            "p50_latency_ms": round(percentile(50), 2),
+            "p95_latency_ms": round(percentile(95), 2),
+            "success_rate_percent": round(successes / count * 100, 2)
+        }
+    
     def _save_usage(self):
         """Save usage data to file"""
         try:
-            with open(self.log_file, 'w') as f:
-                json.dump(self.usage_data, f, indent=2)
+            with profile_stage("monitor.save"):
+                save_histories(self.log_file, self.totals, self._histories)
+            self._unsaved_attempts = 0
         except IOError as e:
             print(f"⚠️ Warning: Could not save usage data: {e}")
     
+    def flush(self):
+        """Save attempt records not yet written by a request save"""
+        if self._unsaved_attempts:
+            self._save_usage()
+    
     def get_summary(self) -> Dict:
         """
         Get usage summary statistics
@@ -112,20 +475,19 @@ class GroqUsageMonitor:
         Returns:
             Dict with summary metrics
         """
-        total_requests = self.usage_data["total_requests"]
-        total_tokens = self.usage_data["total_tokens"]
-        total_latency = self.usage_data["total_latency_ms"]
+        total_requests = self.totals["total_requests"]
+        total_tokens = self.totals["total_tokens"]
+        total_latency = self.totals["total_latency_ms"]
         
         # Calculate averages
         avg_tokens = total_tokens / total_requests if total_requests > 0 else 0
         avg_latency = total_latency / total_requests if total_requests > 0 else 0
-        avg_prompt_tokens = self.usage_data["total_prompt_tokens"] / total_requests if total_requests > 0 else 0
-        avg_completion_tokens = self.usage_data["total_completion_tokens"] / total_requests if total_requests > 0 else 0
+        avg_prompt_tokens = self.totals["total_prompt_tokens"] / total_requests if total_requests > 0 else 0
+        avg_completion_tokens = self.totals["total_completion_tokens"] / total_requests if total_requests > 0 else 0
         
         # Calculate success rate from recent requests
-        recent_requests = self.usage_data["requests"][-100:] if self.usage_data["requests"] else []
-        success_count = sum(1 for r in recent_requests if r.get("success", True))
-        success_rate = (success_count / len(recent_requests) * 100) if recent_requests else 100.0
+        recent_success = self.requests.column("success", 100)
+        success_rate = (sum(recent_success) / len(recent_success) * 100) if recent_success else 100.0
         
         # Groq pricing (free tier for now, but track for future)
         # Free tier: 14,400 tokens/min, 6,000 requests/min
@@ -134,8 +496,8 @@ class GroqUsageMonitor:
         return {
             "total_requests": total_requests,
             "total_tokens": total_tokens,
-            "total_prompt_tokens": self.usage_data["total_prompt_tokens"],
-            "total_completion_tokens": self.usage_data["total_completion_tokens"],
+            "total_prompt_tokens": self.totals["total_prompt_tokens"],
+            "total_completion_tokens": self.totals["total_completion_tokens"],
             "avg_tokens_per_request": round(avg_tokens, 2),
             "avg_prompt_tokens": round(avg_prompt_tokens, 2),
             "avg_completion_tokens": round(avg_completion_tokens, 2),
@@ -161,15 +523,102 @@ class GroqUsageMonitor:
         print(f"Success Rate:         {summary['success_rate_percent']:.2f}%")
         print(f"Estimated Cost:       ${summary['estimated_cost_usd']:.4f}")
         print(f"Status:               {summary['note']}")
+        
+        window = self.get_window_stats(3600)
+        if window["requests"]:
+            print(f"Last Hour:            {window['requests']:,} req | "
+                  f"p50 {window['p50_latency_ms']:.0f} ms | p95 {window['p95_latency_ms']:.0f} ms")
+        
+        route_summary = self.get_route_summary()
+        if route_summary:
+            print("-" * 60)
+            print("Routing Tiers:")
+            for route, stats in sorted(route_summary.items()):
+                print(f"  - {route:<10} {stats['count']:>5,} req | "
+                      f"{stats['avg_latency_ms']:>8.2f} ms | "
+                      f"{stats['avg_tokens']:>7.2f} tokens | "
+                      f"{stats['success_rate_percent']:.0f}% ok | "
+                      f"score {stats['avg_top_score']:.2f}")
+        
+        attempt_summary = self.get_attempt_summary()
+        if attempt_summary:
+            print("-" * 60)
+            print("Attempts:")
+            for operation, stats in sorted(attempt_summary.items()):
+                print(f"  - {operation:<14} {stats['attempts']:>5,} tries | "
+                      f"{stats['retry']:>4,} retried | {stats['failed']:>4,} failed | "
+                      f"{stats['avg_attempt_latency_ms']:>8.2f} ms avg")
         print("=" * 60 + "\n")
     
     def get_recent_requests(self, count: int = 10) -> List[Dict]:
         """Get the most recent N requests"""
-        return self.usage_data["requests"][-count:] if self.usage_data["requests"] else []
+        return [self._request_dict(r) for r in self.requests.records(last=count)]
+    
+    @staticmethod
+    def _request_dict(record: Dict) -> Dict:
+        """Columnar record -> the request dict shape returned by log_request"""
+        request = {
+            "timestamp": epoch_to_iso(record["timestamp"]),
+            "model": record["model"],
+            "prompt_tokens": record["prompt_tokens"],
+            "completion_tokens": record["completion_tokens"],
+            "total_tokens": record["prompt_tokens"] + record["completion_tokens"],
+            "latency_ms": round(record["latency_ms"], 2),
+            "success": record["success"],
+            "question_preview": record["question_preview"],
+            "error": record["error"]
+        }
+        if record["route"]:
+            request["route"] = record["route"]
+        decision = _decision_dict(record)
+        if decision:
+            request["route_decision"] = {"tier": record["route"], **decision}
+        return request
+    
+    @property
+    def usage_data(self) -> Dict:
+        """Usage totals and history in the legacy JSON layout (built on demand)"""
+        attempts = []
+        for a in self.attempts.records():
+            attempts.append({
+                "timestamp": epoch_to_iso(a["timestamp"]),
+                "operation": a["operation"],
+                "attempt": a["attempt"],
+                "latency_ms": round(a["latency_ms"], 2),
+                "outcome": a["outcome"],
+                "error": a["error"],
+                "wait_s": round(a["wait_s"], 3) if a["outcome"] == "retry" else None
+            })
+        direct_answers = []
+        for d in self.direct_answers.records():
+            answer = {
+                "timestamp": epoch_to_iso(d["timestamp"]),
+                "route": "direct",
+                "latency_ms": round(d["latency_ms"], 2),
+                "top_score": round(d["top_score"], 4),
+                "question_preview": d["question_preview"]
+            }
+            decision = _decision_dict(d)
+            if decision:
+                answer["route_decision"] = {"tier": "direct", **decision}
+            direct_answers.append(answer)
+        return {
+            **self.totals,
+            "requests": [self._request_dict(r) for r in self.requests.records()],
+            "attempts": attempts,
+            "direct_answers": direct_answers
+        }
+    
+    def export_json(self, path: str):
+        """Write usage data as human-readable JSON (legacy layout)"""
+        with open(path, 'w') as f:
+            json.dump(self.usage_data, f, indent=2)
     
     def clear_history(self):
         """Clear all usage history (use with caution)"""
-        self.usage_data = self._init_usage_data()
+        self.totals = self._init_totals()
+        for history in self._histories.values():
+            history.clear()
         self._save_usage()
         print("✅ Usage history cleared")
 
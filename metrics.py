@@ -0,0 +1,385 @@
+"""
+Pipeline Metrics
+In-process Prometheus metrics for the RAG pipeline and Groq usage, exposed
+over a local /metrics HTTP endpoint or written to a node-exporter textfile.
+
+Enable with METRICS_PORT=9464 (HTTP) and/or METRICS_TEXTFILE=path.prom.
+
+Updates are lock-free on the hot path: every thread increments its own
+value shard, and shards are only summed when metrics are scraped.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from config import env_float, env_int, env_str
+
+METRICS_PORT = env_int('METRICS_PORT', 0)
+METRICS_ADDR = env_str('METRICS_ADDR', '127.0.0.1')
+METRICS_TEXTFILE = env_str('METRICS_TEXTFILE', '')
+METRICS_TEXTFILE_INTERVAL = env_float('METRICS_TEXTFILE_INTERVAL', 15.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Shards:
+    """Per-thread value arrays: writers never contend, readers sum all shards"""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._all: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def local(self) -> List[float]:
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = [0.0] * self._size
+            with self._lock:
+                self._all.append(values)
+            self._local.values = values
+        return values
+
+    def sum(self) -> List[float]:
+        with self._lock:
+            shards = list(self._all)
+        return [sum(column) for column in zip(*shards)] if shards else [0.0] * self._size
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """Base for labelled metrics; children are created once per label set"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(str(kwargs[n]) for n in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @property
+    def family_name(self) -> str:
+        """Name used in # HELP / # TYPE (must match the sample names)"""
+        return self.name
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self, labelvalues, child) -> List[str]:
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.family_name} {self.documentation}", f"# TYPE {self.family_name} {self.kind}"]
+        if not self.labelnames:
+            self.labels()  # unlabelled metrics always expose a sample
+        with self._lock:
+            children = sorted(self._children.items(), key=lambda item: item[0])
+        for labelvalues, child in children:
+            lines.extend(self._samples(labelvalues, child))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1.0):
+        self._shards.local()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._shards.sum()[0]
+
+
+class Counter(_Metric):
+    """Monotonic counter"""
+    kind = "counter"
+
+    @property
+    def family_name(self) -> str:
+        # Text format 0.0.4: the sample is <name>_total, so the family is too
+        return f"{self.name}_total"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self, labelvalues, child):
+        labels = _format_labels(self.labelnames, labelvalues)
+        return [f"{self.family_name}{labels} {_format_value(child.value)}"]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from `function` at scrape time"""
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        return float(self._function()) if self._function else self._value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed at scrape time"""
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self.labels().set_function(function)
+
+    def _samples(self, labelvalues, child):
+        labels = _format_labels(self.labelnames, labelvalues)
+        return [f"{self.name}{labels} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        # Shard layout: one slot per bucket (incl. +Inf), then sum
+        self._shards = _Shards(len(buckets) + 1)
+
+    def observe(self, value: float):
+        values = self._shards.local()
+        values[bisect.bisect_left(self._buckets, value)] += 1
+        values[-1] += value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self, labelvalues, child):
+        totals = child._shards.sum()
+        lines = []
+        cumulative = 0.0
+        for bound, count in zip(self.buckets, totals[:-1]):
+            cumulative += count
+            labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+        labels = _format_labels(self.labelnames, labelvalues)
+        lines.append(f"{self.name}_sum{labels} {_format_value(totals[-1])}")
+        lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def generate_latest(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Pipeline and Groq usage metrics
+REQUESTS = REGISTRY.counter(
+    "twin_requests", "Answered questions by model, route tier and status", ("model", "route", "status"))
+TOKENS = REGISTRY.counter(
+    "twin_tokens", "Groq tokens consumed by model and kind (prompt/completion)", ("model", "kind"))
+STAGE_LATENCY = REGISTRY.histogram(
+    "twin_stage_latency_seconds", "Latency per pipeline stage, model and status", ("stage", "model", "status"))
+ATTEMPTS = REGISTRY.counter(
+    "twin_attempts", "Retry policy attempts by operation and outcome", ("operation", "outcome"))
+ERRORS = REGISTRY.counter(
+    "twin_errors", "Errors by operation and exception type", ("operation", "type"))
+INFLIGHT = REGISTRY.gauge(
+    "twin_inflight_requests", "Questions currently being answered")
+RETRY_BUDGET_TOKENS = REGISTRY.gauge(
+    "twin_retry_budget_tokens", "Retries currently available in the process-wide retry budget")
+
+
+def _retry_budget_tokens() -> float:
+    from retry_policy import RETRY_BUDGET
+    return RETRY_BUDGET.available
+
+
+RETRY_BUDGET_TOKENS.set_function(_retry_budget_tokens)
+
+
+@contextmanager
+def time_stage(stage: str, model: str = ""):
+    """
+    Observe STAGE_LATENCY for the block, with status "success" or "error"
+
+    Usage:
+        with time_stage("prompt.build"):
+            ...
+    """
+    start_time = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "success"
+    finally:
+        STAGE_LATENCY.labels(stage=stage, model=model, status=status).observe(time.perf_counter() - start_time)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.generate_latest().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep scrapes out of the chat output
+
+
+def start_http_server(port: int, addr: str = '127.0.0.1',
+                      registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve GET /metrics on a daemon thread"""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((addr, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_textfile(path: str, registry: MetricsRegistry = REGISTRY):
+    """Atomically write metrics for the node exporter textfile collector"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(registry.generate_latest())
+    os.replace(tmp_path, path)
+
+
+def start_textfile_writer(path: str, interval: float = METRICS_TEXTFILE_INTERVAL,
+                          registry: MetricsRegistry = REGISTRY) -> threading.Thread:
+    """Rewrite the textfile every `interval` seconds on a daemon thread"""
+    def loop():
+        while True:
+            try:
+                write_textfile(path, registry)
+            except OSError as e:
+                print(f"⚠️ Warning: Could not write metrics textfile: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="metrics-textfile", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_exporters():
+    """Start whichever exporters are configured via METRICS_PORT / METRICS_TEXTFILE"""
+    if METRICS_PORT:
+        try:
+            start_http_server(METRICS_PORT, METRICS_ADDR)
+            print(f"📈 Metrics: http://{METRICS_ADDR}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"⚠️ Warning: Could not start metrics endpoint: {e}")
+    if METRICS_TEXTFILE:
+        start_textfile_writer(METRICS_TEXTFILE)
+        print(f"📈 Metrics textfile: {METRICS_TEXTFILE}")
+
+
+# Example usage
+if __name__ == "__main__":
+    REQUESTS.labels(model="llama-3.1-8b-instant", route="fast", status="success").inc()
+    TOKENS.labels(model="llama-3.1-8b-instant", kind="prompt").inc(150)
+    STAGE_LATENCY.labels(stage="groq.generate", model="llama-3.1-8b-instant", status="success").observe(0.75)
+    print(REGISTRY.generate_latest())
@@ -0,0 +1,212 @@
+"""
+Query Profiling
+Opt-in cProfile + tracemalloc profiling of sampled RAG queries.
+
+Enable with PROFILE_ENABLED=true (or `python embed_digitaltwin.py --profile`).
+Each sampled query writes, under PROFILE_DIR:
+  - <trace_id>.pstats  CPU profile (snakeviz / flameprof / gprof2dot ready)
+  - <trace_id>.json    per-stage wall time and top allocations
+
+Wall times exclude the profiler's own snapshot cost, including that of
+nested stages (reported separately as profiler_overhead_ms).
+
+When profiling is off, profile_query() and profile_stage() return a shared
+no-op context manager, so the hooks can stay in the hot path.
+"""
+
+import cProfile
+import json
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import env_bool, env_float, env_int, env_str
+
+PROFILE_ENABLED = env_bool('PROFILE_ENABLED', False)
+PROFILE_SAMPLE_RATE = env_float('PROFILE_SAMPLE_RATE', 1.0)
+PROFILE_DIR = env_str('PROFILE_DIR', 'profiles')
+PROFILE_TOP_ALLOCATIONS = env_int('PROFILE_TOP_ALLOCATIONS', 5)
+
+_NULL_CONTEXT = nullcontext()
+_local = threading.local()
+
+
+def configure(enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+              output_dir: Optional[str] = None):
+    """Override the environment settings (used by CLI switches)"""
+    global PROFILE_ENABLED, PROFILE_SAMPLE_RATE, PROFILE_DIR
+    if enabled is not None:
+        PROFILE_ENABLED = enabled
+    if sample_rate is not None:
+        PROFILE_SAMPLE_RATE = sample_rate
+    if output_dir is not None:
+        PROFILE_DIR = output_dir
+
+
+class QueryProfile:
+    """CPU profile plus per-stage timings and allocations for one query"""
+
+    def __init__(self, name: str, question: Optional[str] = None):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.question = question
+        self.profiler = cProfile.Profile()
+        self.stages: List[Dict] = []
+        self.overhead_s = 0.0  # time spent taking and diffing snapshots
+
+    def record_stage(self, stage: str, wall_ms: float,
+                     before: tracemalloc.Snapshot, after: tracemalloc.Snapshot):
+        """Summarize the biggest allocation growth between two snapshots"""
+        diffs = [d for d in after.compare_to(before, 'lineno') if d.size_diff > 0]
+        self.stages.append({
+            "stage": stage,
+            "wall_ms": round(wall_ms, 3),
+            "allocated_kib": round(sum(d.size_diff for d in diffs) / 1024, 2),
+            "top_allocations": [
+                {
+                    "location": f"{d.traceback[0].filename}:{d.traceback[0].lineno}",
+                    "size_kib": round(d.size_diff / 1024, 2),
+                    "count": d.count_diff
+                }
+                for d in diffs[:PROFILE_TOP_ALLOCATIONS]
+            ]
+        })
+
+    def save(self, total_ms: float, peak_bytes: int) -> Path:
+        """Write <trace_id>.pstats and <trace_id>.json; returns the pstats path"""
+        output_dir = Path(PROFILE_DIR)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        pstats_path = output_dir / f"{self.trace_id}.pstats"
+        self.profiler.dump_stats(str(pstats_path))
+
+        summary = {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "question_preview": self.question[:50] + "..." if self.question and len(self.question) > 50 else self.question,
+            "total_ms": round(total_ms, 3),
+            "profiler_overhead_ms": round(self.overhead_s * 1000, 3),
+            "peak_traced_kib": round(peak_bytes / 1024, 2),
+            "pstats": pstats_path.name,
+            "stages": self.stages
+        }
+        with open(output_dir / f"{self.trace_id}.json", 'w') as f:
+            json.dump(summary, f, indent=2)
+        return pstats_path
+
+
+def current_profile() -> Optional[QueryProfile]:
+    """Profile active on this thread, if any"""
+    return getattr(_local, 'profile', None)
+
+
+def profile_query(name: str, question: Optional[str] = None):
+    """
+    Profile one query if profiling is enabled and the query is sampled
+
+    Usage:
+        with profile_query("rag_query", question=question):
+            ...
+    """
+    if not PROFILE_ENABLED or current_profile() is not None:
+        return _NULL_CONTEXT
+    if random.random() >= PROFILE_SAMPLE_RATE:
+        return _NULL_CONTEXT
+    return _profiled_query(name, question)
+
+
+@contextmanager
+def _profiled_query(name: str, question: Optional[str]):
+    profile = QueryProfile(name, question)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    _local.profile = profile
+    start_time = time.perf_counter()
+    profile.profiler.enable()
+    try:
+        yield profile
+    finally:
+        profile.profiler.disable()
+        total_ms = (time.perf_counter() - start_time - profile.overhead_s) * 1000
+        _local.profile = None
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+        try:
+            pstats_path = profile.save(total_ms, peak_bytes)
+            print(f"🔬 Profile {profile.trace_id}: {total_ms:.0f} ms, saved to {pstats_path}")
+        except OSError as e:
+            print(f"⚠️ Warning: Could not save profile {profile.trace_id}: {e}")
+
+
+def profile_stage(stage: str):
+    """
+    Mark a stage inside a profiled query (no-op outside one)
+
+    Usage:
+        with profile_stage("prompt.build"):
+            ...
+    """
+    profile = current_profile()
+    if profile is None:
+        return _NULL_CONTEXT
+    return _profiled_stage(profile, stage)
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    )
+
+
+@contextmanager
+def _profiled_stage(profile: QueryProfile, stage: str):
+    # Snapshots and diffs run with the CPU profiler paused so they don't
+    # show up as hot spots in the pstats output
+    # Their cost is also subtracted from the wall time of enclosing stages
+    profile.profiler.disable()
+    overhead_start = time.perf_counter()
+    before = _take_snapshot()
+    start_time = time.perf_counter()
+    profile.overhead_s += start_time - overhead_start
+    nested_overhead_start = profile.overhead_s
+    profile.profiler.enable()
+    try:
+        yield
+    finally:
+        end_time = time.perf_counter()
+        profile.profiler.disable()
+        wall_ms = (end_time - start_time - (profile.overhead_s - nested_overhead_start)) * 1000
+        profile.record_stage(stage, wall_ms, before, _take_snapshot())
+        profile.overhead_s += time.perf_counter() - end_time
+        profile.profiler.enable()
+
+
+def print_profile(path: str, limit: int = 20):
+    """Print the top functions by cumulative time from a saved .pstats file"""
+    import pstats
+    pstats.Stats(path).sort_stats('cumulative').print_stats(limit)
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        print_profile(sys.argv[1])
+    else:
+        configure(enabled=True, sample_rate=1.0)
+        with profile_query("example", question="What are your Python skills?") as prof:
+            with profile_stage("build"):
+                data = [str(i) * 10 for i in range(50000)]
+            with profile_stage("serialize"):
+                with profile_stage("serialize.inner"):
+                    json.dumps(data)
+        print(f"Trace id: {prof.trace_id}")
@@ -0,0 +1,23 @@
+"""
+RAG Prompts
+Prompt construction shared by the chat app and the retrieval evaluation.
+
+Kept free of client, monitor and dotenv setup so it can be imported anywhere
+without side effects.
+"""
+
+from typing import List
+
+
+def build_prompt(question: str, top_docs: List[str]) -> str:
+    """Build the RAG prompt from retrieved "title: content" documents"""
+    context = "\n\n".join(top_docs)
+    return f"""Based on the following information about yourself, answer the question.
+Speak in first person as if you are describing your own background.
+
+Your Information:
+{context}
+
+Question: {question}
+
+Provide a helpful, professional response:"""
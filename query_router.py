@@ -0,0 +1,165 @@
+"""
+Query Router
+Pick a Groq model tier and output budget per question using local heuristics
+and vector retrieval scores, or answer directly from a single strong chunk.
+"""
+
+import re
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+from config import env_bool, env_float, env_int, env_str
+
+# Model tiers (override via .env)
+STANDARD_MODEL = env_str('GROQ_MODEL', 'llama-3.1-8b-instant')
+FAST_MODEL = env_str('GROQ_FAST_MODEL', STANDARD_MODEL)
+DEEP_MODEL = env_str('GROQ_DEEP_MODEL', STANDARD_MODEL)  # larger models are opt-in
+FAST_MAX_TOKENS = env_int('GROQ_FAST_MAX_TOKENS', 200)
+STANDARD_MAX_TOKENS = env_int('GROQ_MAX_TOKENS', 500)
+DEEP_MAX_TOKENS = env_int('GROQ_DEEP_MAX_TOKENS', 900)
+
+# Direct-answer thresholds: skip the LLM when one chunk clearly answers the question
+DIRECT_ANSWER_MIN_SCORE = env_float('ROUTER_DIRECT_MIN_SCORE', 0.90)
+DIRECT_ANSWER_MIN_GAP = env_float('ROUTER_DIRECT_MIN_GAP', 0.05)
+ROUTER_ENABLED = env_bool('ROUTER_ENABLED', True)
+
+# Phrases that signal an open-ended, multi-part answer
+COMPLEX_PATTERNS = [
+    r"\bwalk me through\b",
+    r"\bdescribe\b",
+    r"\bexplain\b",
+    r"\bhow (did|do|would) you\b",
+    r"\btell me about a time\b",
+    r"\bsystem design\b",
+    r"\barchitect",
+    r"\bcompare\b",
+    r"\btrade-?offs?\b",
+    r"\bwhy\b",
+    r"\bchallenge",
+]
+
+# Phrases that signal a short factual lookup
+SIMPLE_PATTERNS = [
+    r"^(where|when|what is your|what's your|which|who)\b",
+    r"\blocated\b",
+    r"\blocation\b",
+    r"\bsalary\b",
+    r"\bemail\b",
+    r"\bdegree\b",
+    r"\bgpa\b",
+    r"\bhow (many|long)\b",
+    r"\b(are|do) you (willing|open|available)\b",
+]
+
+_COMPLEX_RE = [re.compile(p, re.IGNORECASE) for p in COMPLEX_PATTERNS]
+_SIMPLE_RE = [re.compile(p, re.IGNORECASE) for p in SIMPLE_PATTERNS]
+
+
+@dataclass
+class RouteDecision:
+    """Routing decision for a single question"""
+    tier: str                       # 'direct', 'fast', 'standard' or 'deep'
+    model: Optional[str]            # None when the LLM is skipped
+    max_tokens: int
+    reason: str
+    top_score: float = 0.0
+    score_gap: float = 0.0
+    complexity: int = 0
+
+    @property
+    def skip_llm(self) -> bool:
+        return self.tier == 'direct'
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def score_complexity(question: str) -> int:
+    """
+    Score question complexity with cheap local heuristics
+
+    Returns:
+        Negative for short factual lookups, positive for open-ended questions
+    """
+    text = question.strip()
+    score = 0
+    score += sum(2 for pattern in _COMPLEX_RE if pattern.search(text))
+    score -= sum(1 for pattern in _SIMPLE_RE if pattern.search(text))
+
+    word_count = len(text.split())
+    if word_count > 15:
+        score += 1
+    elif word_count <= 6:
+        score -= 1
+
+    # Multi-part questions ("... and ...?", several question marks)
+    if text.count('?') > 1 or re.search(r"\band\b.*\?", text, re.IGNORECASE):
+        score += 1
+
+    return score
+
+
+def is_factual_lookup(question: str) -> bool:
+    """True when the question matches at least one SIMPLE_PATTERNS phrase"""
+    text = question.strip()
+    return any(pattern.search(text) for pattern in _SIMPLE_RE)
+
+
+def route_question(question: str, scores: List[float]) -> RouteDecision:
+    """
+    Pick a model tier and output budget for a question
+
+    Args:
+        question: User question
+        scores: Retrieval scores of the returned chunks, highest first
+
+    Returns:
+        RouteDecision describing the tier, model and max_tokens to use
+    """
+    sorted_scores = sorted(scores, reverse=True)
+    top_score = sorted_scores[0] if sorted_scores else 0.0
+    second_score = sorted_scores[1] if len(sorted_scores) > 1 else 0.0
+    score_gap = top_score - second_score
+    complexity = score_complexity(question)
+
+    def decision(tier, model, max_tokens, reason):
+        return RouteDecision(
+            tier=tier, model=model, max_tokens=max_tokens, reason=reason,
+            top_score=round(top_score, 4), score_gap=round(score_gap, 4),
+            complexity=complexity
+        )
+
+    if not ROUTER_ENABLED:
+        return decision('standard', STANDARD_MODEL, STANDARD_MAX_TOKENS, "router disabled")
+
+    # Brevity alone is not enough to skip the LLM: require a factual lookup phrase
+    if (complexity < 0 and is_factual_lookup(question)
+            and top_score >= DIRECT_ANSWER_MIN_SCORE
+            and score_gap >= DIRECT_ANSWER_MIN_GAP):
+        return decision('direct', None, 0, "single high-score chunk answers a factual question")
+
+    if complexity >= 3:
+        return decision('deep', DEEP_MODEL, DEEP_MAX_TOKENS, "open-ended question")
+
+    # Brevity alone ("Tell me about your work experience") still needs a full answer
+    if complexity < 0 and is_factual_lookup(question):
+        return decision('fast', FAST_MODEL, FAST_MAX_TOKENS, "short factual question")
+
+    # Weak retrieval means the model has to synthesise more from less
+    if top_score < 0.75 and complexity > 0:
+        return decision('deep', DEEP_MODEL, DEEP_MAX_TOKENS, "low retrieval confidence")
+
+    return decision('standard', STANDARD_MODEL, STANDARD_MAX_TOKENS, "default tier")
+
+
+# Example usage
+if __name__ == "__main__":
+    examples = [
+        ("Where are you located?", [0.93, 0.81, 0.78]),
+        ("Tell me about your work experience", [0.93, 0.81, 0.78]),
+        ("What are your technical skills?", [0.88, 0.80, 0.77]),
+        ("How many years of Python experience do you have?", [0.88, 0.80, 0.77]),
+        ("Walk me through your system design experience and the trade-offs you made", [0.82, 0.80, 0.79]),
+    ]
+    for question, scores in examples:
+        route = route_question(question, scores)
+        print(f"{route.tier:>8} | {route.model or '-':<24} | {route.max_tokens:>4} | {question}")
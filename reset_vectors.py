@@ -5,7 +5,8 @@ Delete all existing vectors and re-upload with proper metadata
 
 import os
 from dotenv import load_dotenv
-from upstash_vector import Index
+from clients import get_vector_index
+from retry_policy import get_vector_retry_policy
 
 # Load environment variables
 load_dotenv()
@@ -14,12 +15,18 @@ def reset_database():
     """Delete all vectors from Upstash"""
     print("🔄 Connecting to Upstash Vector...")
     
+    index = get_vector_index()
+    if not index:
+        return False
+    
+    # reset() is idempotent, so every call here can be retried safely
+    policy = get_vector_retry_policy()
+    
     try:
-        index = Index.from_env()
         print("✅ Connected successfully!")
         
         # Check current count
-        info = index.info()
+        info = policy.call(index.info, operation="vector.info")
         current_count = getattr(info, 'vector_count', 0)
         print(f"📊 Current vectors in database: {current_count}")
         
@@ -29,11 +36,11 @@ def reset_database():
         
         # Reset the database
         print(f"🗑️  Deleting {current_count} vectors...")
-        index.reset()
+        policy.call(index.reset, operation="vector.reset")
         print("✅ Database reset successfully!")
         
         # Verify deletion
-        info = index.info()
+        info = policy.call(index.info, operation="vector.info")
         new_count = getattr(info, 'vector_count', 0)
         print(f"📊 Vectors after reset: {new_count}")
         
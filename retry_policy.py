@@ -0,0 +1,257 @@
+"""
+Retry Policy
+Deadline-aware retries with decorrelated-jitter backoff, Retry-After support
+and a process-wide retry budget, shared by Groq calls and vector queries.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional, Tuple, Type
+from config import env_float, env_int
+
+# Overall time budgets per logical request, across all attempts
+GROQ_DEADLINE = env_float('GROQ_DEADLINE', 60.0)
+VECTOR_DEADLINE = env_float('VECTOR_DEADLINE', 10.0)
+
+RETRY_MAX_ATTEMPTS = env_int('RETRY_MAX_ATTEMPTS', 3)
+RETRY_BASE_DELAY = env_float('RETRY_BASE_DELAY', 0.5)
+RETRY_MAX_DELAY = env_float('RETRY_MAX_DELAY', 8.0)
+RETRY_BUDGET_RATIO = env_float('RETRY_BUDGET_RATIO', 0.2)
+RETRY_BUDGET_MIN_PER_SEC = env_float('RETRY_BUDGET_MIN_PER_SEC', 0.5)
+
+
+class Deadline:
+    """Overall time budget for one logical request, across all attempts"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+
+class RetryBudget:
+    """
+    Process-wide token bucket limiting retries to a fraction of traffic
+
+    Every first attempt deposits `ratio` tokens and every retry withdraws one,
+    so under overload retries stay at roughly `ratio` of requests instead of
+    multiplying load. A small time-based trickle keeps low-traffic processes
+    able to retry at all.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO,
+                 min_per_second: float = RETRY_BUDGET_MIN_PER_SEC,
+                 max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens,
+                           self._tokens + (now - self._last_refill) * self.min_per_second)
+        self._last_refill = now
+
+    def record_request(self):
+        """Deposit credit for a first attempt"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        """Withdraw one retry; False when the budget is exhausted"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+# Shared by every RetryPolicy in the process
+RETRY_BUDGET = RetryBudget()
+
+
+def parse_retry_after(error: BaseException) -> Optional[float]:
+    """
+    Extract the server's requested delay from an HTTP error, if any
+
+    Understands `retry-after-ms`, `retry-after` in seconds, and
+    `retry-after` as an HTTP date.
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Run a callable with deadline-bounded, jittered retries
+
+    Example:
+        policy = RetryPolicy(retry_on=(RateLimitError, InternalServerError, APIConnectionError),
+                             give_up_on=(AuthenticationError,))
+        deadline = Deadline(30)
+        result = policy.call(lambda: do_request(timeout=deadline.remaining()),
+                             operation="groq.chat", deadline=deadline)
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+        give_up_on: Tuple[Type[BaseException], ...] = (),
+        budget: Optional[RetryBudget] = None
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+        self.give_up_on = give_up_on
+        self.budget = budget or RETRY_BUDGET
+
+    def next_delay(self, previous_delay: float) -> float:
+        """Decorrelated jitter: uniform(base, previous * 3), capped at max_delay"""
+        upper = max(self.base_delay, previous_delay * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+    def _is_retryable(self, error: BaseException) -> bool:
+        if isinstance(error, self.give_up_on):
+            return False
+        return isinstance(error, self.retry_on)
+
+    def call(
+        self,
+        fn: Callable,
+        operation: str = "request",
+        deadline: Optional[Deadline] = None,
+        monitor=None
+    ):
+        """
+        Call `fn` until it succeeds, the error is not retryable, attempts run
+        out, the retry budget is exhausted, or the next wait would overrun
+        the deadline. Re-raises the last error on failure.
+
+        Args:
+            fn: Zero-argument callable performing one attempt
+            operation: Label used in logs and per-attempt monitor records
+            deadline: Overall deadline shared by all attempts
+            monitor: Optional GroqUsageMonitor receiving per-attempt records
+        """
+        self.budget.record_request()
+        delay = self.base_delay
+
+        for attempt in range(1, self.max_attempts + 1):
+            attempt_start = time.time()
+            try:
+                result = fn()
+            except Exception as e:
+                latency_ms = (time.time() - attempt_start) * 1000
+                wait_s = self._plan_retry(e, attempt, delay, deadline)
+                if monitor is not None:
+                    monitor.log_attempt(
+                        operation=operation, attempt=attempt, latency_ms=latency_ms,
+                        outcome="retry" if wait_s is not None else "failed",
+                        error=f"{type(e).__name__}: {str(e)}", wait_s=wait_s
+                    )
+                if wait_s is None:
+                    raise
+                print(f"⏳ {operation} failed with {type(e).__name__} "
+                      f"(attempt {attempt}/{self.max_attempts}), retrying in {wait_s:.2f}s...")
+                time.sleep(wait_s)
+                delay = max(wait_s, self.base_delay)
+                continue
+
+            if monitor is not None:
+                monitor.log_attempt(
+                    operation=operation, attempt=attempt,
+                    latency_ms=(time.time() - attempt_start) * 1000, outcome="success"
+                )
+            return result
+
+    def _plan_retry(self, error: BaseException, attempt: int, delay: float,
+                    deadline: Optional[Deadline]) -> Optional[float]:
+        """Return seconds to wait before retrying, or None to give up"""
+        if not self._is_retryable(error) or attempt >= self.max_attempts:
+            return None
+
+        wait_s = self.next_delay(delay)
+        retry_after = parse_retry_after(error)
+        if retry_after is not None:
+            wait_s = max(wait_s, retry_after)
+
+        if deadline is not None and wait_s >= deadline.remaining():
+            return None
+        if not self.budget.try_acquire():
+            print("⚠️ Retry budget exhausted, not retrying")
+            return None
+        return wait_s
+
+
+_groq_retry_policy: Optional[RetryPolicy] = None
+_vector_retry_policy: Optional[RetryPolicy] = None
+
+
+def get_groq_retry_policy() -> RetryPolicy:
+    """Shared policy for Groq calls, built on first use (keeps `groq` import lazy)"""
+    global _groq_retry_policy
+    if _groq_retry_policy is None:
+        from groq import APIConnectionError, ConflictError, InternalServerError, RateLimitError
+        # Only transient failures: 429, 409, 5xx, connection errors and timeouts
+        # (APITimeoutError is an APIConnectionError). Other 4xx give up at once.
+        _groq_retry_policy = RetryPolicy(
+            retry_on=(RateLimitError, ConflictError, InternalServerError, APIConnectionError, TimeoutError)
+        )
+    return _groq_retry_policy
+
+
+def get_vector_retry_policy() -> RetryPolicy:
+    """Shared policy for Upstash Vector calls, built on first use"""
+    global _vector_retry_policy
+    if _vector_retry_policy is None:
+        import httpx
+        # Only network failures and timeouts: UpstashError carries no status code
+        # and is raised for bad tokens and bad requests too, so it is not retried
+        _vector_retry_policy = RetryPolicy(retry_on=(httpx.TransportError, TimeoutError))
+    return _vector_retry_policy
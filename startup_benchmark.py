@@ -0,0 +1,127 @@
+"""
+Startup Benchmark
+Measure time-to-first-answer after process launch for the Digital Twin CLI.
+
+Each run launches a fresh Python process that imports embed_digitaltwin,
+sets up the clients and answers one question, reporting when each stage
+finished relative to the moment the process was spawned. Usage is logged to
+a scratch file (GROQ_USAGE_FILE), not the real groq_usage.bin.
+
+Usage:
+    python startup_benchmark.py                      # 5 runs, full first answer
+    python startup_benchmark.py --stage import       # import cost only (no network)
+    python startup_benchmark.py --no-warmup --http2  # compare transport settings
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STAGES = ["import", "setup", "answer"]
+
+# Runs inside the child process; prints stage completion times (epoch seconds)
+CHILD_SCRIPT = """
+import json, sys, time
+stage = sys.argv[1]
+question = sys.argv[2]
+marks = {}
+import embed_digitaltwin as app
+marks["import"] = time.time()
+if stage != "import":
+    index = app.setup_vector_database()
+    if app.CLIENT_WARMUP:
+        app.warm_up(vector=False)
+    marks["setup"] = time.time()
+    if stage == "answer" and index:
+        app.rag_query(index, None, question)
+        marks["answer"] = time.time()
+print("__BENCH__" + json.dumps(marks))
+"""
+
+
+def run_once(stage: str, question: str, env: dict) -> dict:
+    """Launch one child process and return stage timings in ms since launch"""
+    launched_at = time.time()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, stage, question],
+        capture_output=True, text=True, env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    exited_at = time.time()
+
+    marks = {}
+    for line in result.stdout.splitlines():
+        if line.startswith("__BENCH__"):
+            marks = json.loads(line[len("__BENCH__"):])
+    if not marks:
+        raise RuntimeError(f"Benchmark child failed:\n{result.stdout}\n{result.stderr}")
+
+    timings = {name: (ts - launched_at) * 1000 for name, ts in marks.items()}
+    timings["exit"] = (exited_at - launched_at) * 1000
+    return timings
+
+
+def summarize(runs: list) -> dict:
+    """Min / median / max per stage across runs"""
+    summary = {}
+    for name in STAGES + ["exit"]:
+        values = [run[name] for run in runs if name in run]
+        if values:
+            summary[name] = {
+                "min_ms": round(min(values), 1),
+                "median_ms": round(statistics.median(values), 1),
+                "max_ms": round(max(values), 1)
+            }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Digital Twin time-to-first-answer")
+    parser.add_argument("--runs", type=int, default=5, help="Number of process launches")
+    parser.add_argument("--stage", choices=STAGES, default="answer", help="Last stage to run")
+    parser.add_argument("--question", default="Where are you located?", help="First question to ask")
+    parser.add_argument("--no-warmup", action="store_true", help="Disable background warm-up")
+    parser.add_argument("--http2", action="store_true", help="Enable HTTP/2 transport")
+    parser.add_argument("--output", help="Write raw runs and summary to this JSON file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # Keep benchmark questions out of the real usage history
+    scratch_dir = tempfile.TemporaryDirectory(prefix="twin-bench-")
+    env["GROQ_USAGE_FILE"] = os.path.join(scratch_dir.name, "groq_usage.bin")
+    env["CLIENT_WARMUP"] = "false" if args.no_warmup else "true"
+    if args.http2:
+        env["HTTP2_ENABLED"] = "true"
+
+    print("⏱️ Digital Twin Startup Benchmark")
+    print("=" * 60)
+    print(f"Runs: {args.runs} | Stage: {args.stage} | Warm-up: {not args.no_warmup} | HTTP/2: {args.http2}\n")
+
+    runs = []
+    with scratch_dir:
+        for i in range(1, args.runs + 1):
+            timings = run_once(args.stage, args.question, env)
+            runs.append(timings)
+            stages = " | ".join(f"{name} {ms:,.0f} ms" for name, ms in timings.items())
+            print(f"Run {i}/{args.runs}: {stages}")
+
+    summary = summarize(runs)
+    print("\n" + "-" * 60)
+    print(f"{'Stage':<10} {'min':>12} {'median':>12} {'max':>12}")
+    for name, stats in summary.items():
+        print(f"{name:<10} {stats['min_ms']:>10,.1f}ms {stats['median_ms']:>10,.1f}ms {stats['max_ms']:>10,.1f}ms")
+    print("=" * 60)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "runs": runs, "summary": summary}, f, indent=2)
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
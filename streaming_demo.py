@@ -6,8 +6,8 @@ Demonstrates streaming responses for better user experience
 import os
 import time
 from dotenv import load_dotenv
-from groq import Groq
-from upstash_vector import Index
+from clients import CLIENT_WARMUP, get_groq_client, get_vector_index, vector_timeout, warm_up
+from retry_policy import GROQ_DEADLINE, VECTOR_DEADLINE, Deadline, get_groq_retry_policy, get_vector_retry_policy
 
 # Load environment variables
 load_dotenv()
@@ -17,21 +17,15 @@ GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 DEFAULT_MODEL = os.getenv('GROQ_MODEL', 'llama-3.1-8b-instant')
 GROQ_TEMPERATURE = float(os.getenv('GROQ_TEMPERATURE', '1.0'))
 GROQ_MAX_TOKENS = int(os.getenv('GROQ_MAX_TOKENS', '1024'))
+GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', '30.0'))
 
 
 def setup_groq_client():
     """Setup Groq client"""
-    if not GROQ_API_KEY:
-        print("❌ GROQ_API_KEY not found in .env file")
-        return None
-    
-    try:
-        client = Groq(api_key=GROQ_API_KEY)
+    client = get_groq_client()
+    if client:
         print("✅ Groq client initialized successfully!")
-        return client
-    except Exception as e:
-        print(f"❌ Error initializing Groq client: {str(e)}")
-        return None
+    return client
 
 
 def generate_streaming_response(client, prompt, model=DEFAULT_MODEL):
@@ -49,8 +43,12 @@ def generate_streaming_response(client, prompt, model=DEFAULT_MODEL):
     Returns:
         Complete response text
     """
-    try:
-        completion = client.chat.completions.create(
+    deadline = Deadline(GROQ_DEADLINE)
+    
+    def attempt():
+        if deadline.expired():
+            raise TimeoutError("Request deadline exceeded")
+        return client.chat.completions.create(
             model=model,
             messages=[
                 {
@@ -66,8 +64,13 @@ def generate_streaming_response(client, prompt, model=DEFAULT_MODEL):
             max_completion_tokens=GROQ_MAX_TOKENS,  # Note: Different from max_tokens
             top_p=1,
             stream=True,  # Enable streaming
-            stop=None
+            stop=None,
+            timeout=min(GROQ_TIMEOUT, deadline.remaining())
         )
+    
+    try:
+        # Only opening the stream is retried; once chunks are printed a retry would repeat them
+        completion = get_groq_retry_policy().call(attempt, operation="groq.stream", deadline=deadline)
         
         print("🤖 Digital Twin: ", end="", flush=True)
         full_response = ""
@@ -88,12 +91,18 @@ def generate_streaming_response(client, prompt, model=DEFAULT_MODEL):
 
 def query_vectors(index, query_text, top_k=3):
     """Query Upstash Vector for similar vectors"""
+    deadline = Deadline(VECTOR_DEADLINE)
+    
+    def attempt():
+        with vector_timeout(deadline.remaining()):
+            return index.query(
+                data=query_text,
+                top_k=top_k,
+                include_metadata=True
+            )
+    
     try:
-        results = index.query(
-            data=query_text,
-            top_k=top_k,
-            include_metadata=True
-        )
+        results = get_vector_retry_policy().call(attempt, operation="vector.query", deadline=deadline)
         return results
     except Exception as e:
         print(f"❌ Error querying vectors: {str(e)}")
@@ -166,12 +175,13 @@ def main():
     if not groq_client:
         return
     
-    try:
-        index = Index.from_env()
-        print("✅ Connected to Upstash Vector successfully!\n")
-    except Exception as e:
-        print(f"❌ Error connecting to vector database: {str(e)}")
+    index = get_vector_index()
+    if not index:
         return
+    print("✅ Connected to Upstash Vector successfully!\n")
+    
+    if CLIENT_WARMUP:
+        warm_up()
     
     print("✅ Digital Twin ready with streaming!\n")
     
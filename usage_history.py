@@ -0,0 +1,255 @@
+"""
+Usage History
+Compact, columnar ring buffers for GroqUsageMonitor request history, and a
+binary on-disk format that loads in a single read.
+
+Each history is a fixed-capacity ring of typed `array` columns:
+  - 'd' / 'f' / 'i' / 'b' columns hold numbers (timestamps, tokens, latency, status)
+  - 'str' columns hold ids into an interned string table (model, route, error type)
+  - 'text' columns hold free text in a plain list (question previews)
+"""
+
+import array
+import bisect
+import json
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+MAGIC = b"GQUS"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHI")  # magic, version, header JSON length
+
+_STRING_TYPECODE = 'H'  # interned string ids; 0 means None
+
+
+class ColumnarHistory:
+    """
+    Fixed-capacity ring buffer of typed columns
+
+    Args:
+        schema: (column name, kind) pairs; kind is an array typecode
+            ('d', 'f', 'i', 'b'), 'str' (interned) or 'text' (free text)
+        capacity: Number of most recent records kept (at least 1)
+    """
+
+    def __init__(self, schema: Sequence[Tuple[str, str]], capacity: int = 1000):
+        if capacity < 1:
+            raise ValueError(f"History capacity must be at least 1, got {capacity}")
+        self.schema = list(schema)
+        self.capacity = capacity
+        self.size = 0
+        self._head = 0  # next write position
+        self._strings: List[Optional[str]] = [None]
+        self._string_ids: Dict[str, int] = {}
+        self._columns: Dict[str, object] = {}
+        for name, kind in self.schema:
+            if kind == 'text':
+                self._columns[name] = [None] * capacity
+            else:
+                typecode = _STRING_TYPECODE if kind == 'str' else kind
+                self._columns[name] = array.array(typecode, bytes(array.array(typecode).itemsize * capacity))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(value)
+            self._string_ids[value] = string_id
+        return string_id
+
+    def string(self, string_id: int) -> Optional[str]:
+        return self._strings[string_id]
+
+    def append(self, **values):
+        """Append one record, overwriting the oldest when full"""
+        position = self._head
+        for name, kind in self.schema:
+            value = values.get(name)
+            if kind == 'str':
+                value = self.intern(value)
+            elif kind != 'text' and value is None:
+                value = 0
+            self._columns[name][position] = value
+        self._head = (position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def column(self, name: str, last: Optional[int] = None):
+        """Chronological copy of one column (optionally only the last N records)"""
+        data = self._columns[name]
+        count = self.size if last is None else max(0, min(last, self.size))
+        start = (self._head - count) % self.capacity
+        if start + count <= self.capacity:
+            return data[start:start + count]
+        return data[start:] + data[:(start + count) % self.capacity]
+
+    def strings(self, name: str, last: Optional[int] = None) -> List[Optional[str]]:
+        """Chronological values of an interned string column"""
+        return [self._strings[i] for i in self.column(name, last)]
+
+    def since(self, timestamp: float, time_column: str = 'timestamp') -> int:
+        """Number of trailing records at or after `timestamp` (timestamps are chronological)"""
+        timestamps = self.column(time_column)
+        return len(timestamps) - bisect.bisect_left(timestamps, timestamp)
+
+    def records(self, last: Optional[int] = None) -> Iterator[Dict]:
+        """Chronological records as dicts (strings resolved)"""
+        columns = []
+        for name, kind in self.schema:
+            values = self.column(name, last)
+            if kind == 'str':
+                values = [self._strings[i] for i in values]
+            columns.append((name, kind, values))
+        count = self.size if last is None else max(0, min(last, self.size))
+        for i in range(count):
+            record = {}
+            for name, kind, values in columns:
+                value = values[i]
+                if kind == 'b':
+                    value = bool(value)
+                record[name] = value
+            yield record
+
+    def clear(self):
+        self.__init__(self.schema, self.capacity)
+
+    # Serialization -----------------------------------------------------
+
+    def _dump(self) -> Tuple[Dict, List[bytes]]:
+        """Header metadata and raw column bytes (chronological, strings compacted)"""
+        header = {"capacity": self.capacity, "size": self.size, "columns": [], "strings": [None], "text": {}}
+        blobs = []
+        remap: Dict[int, int] = {0: 0}
+        for name, kind in self.schema:
+            values = self.column(name)
+            if kind == 'text':
+                header["text"][name] = list(values)
+                continue
+            if kind == 'str':
+                # Drop strings only referenced by evicted records
+                ids = array.array(_STRING_TYPECODE)
+                for string_id in values:
+                    if string_id not in remap:
+                        remap[string_id] = len(header["strings"])
+                        header["strings"].append(self._strings[string_id])
+                    ids.append(remap[string_id])
+                values = ids
+            header["columns"].append([name, values.typecode])
+            blobs.append(values.tobytes())
+        return header, blobs
+
+    def _load(self, header: Dict, buffer: memoryview, offset: int) -> int:
+        """Restore from header metadata and `buffer`; returns the new offset"""
+        size = header["size"]
+        loaded: Dict[str, object] = {}
+        for name, typecode in header["columns"]:
+            values = array.array(typecode)
+            nbytes = values.itemsize * size
+            values.frombytes(buffer[offset:offset + nbytes])
+            offset += nbytes
+            loaded[name] = values
+        loaded.update({name: values for name, values in header["text"].items()})
+
+        # Keep the most recent records if the configured capacity shrank
+        keep = min(size, self.capacity)
+        self.clear()
+        self._strings = list(header["strings"])
+        self._string_ids = {s: i for i, s in enumerate(self._strings) if s is not None}
+        for name, kind in self.schema:
+            values = loaded.get(name)
+            if values is None:
+                continue  # column added since the file was written
+            column = self._columns[name]
+            recent = values[size - keep:size]
+            try:
+                column[0:keep] = recent
+            except TypeError:
+                # Saved with a different typecode; convert element by element
+                for i, value in enumerate(recent):
+                    column[i] = value
+        self.size = keep
+        self._head = keep % self.capacity
+        return offset
+
+
+def save_histories(path: Path, totals: Dict, histories: Dict[str, ColumnarHistory]):
+    """Write totals and histories to a single binary file (atomic replace)"""
+    header = {"totals": totals, "histories": {}}
+    blobs = []
+    for name, history in histories.items():
+        history_header, history_blobs = history._dump()
+        header["histories"][name] = history_header
+        blobs.extend(history_blobs)
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for blob in blobs:
+            f.write(blob)
+    tmp_path.replace(path)
+
+
+def load_histories(path: Path, histories: Dict[str, ColumnarHistory]) -> Dict:
+    """
+    Load a file written by save_histories() in one read
+
+    Returns:
+        The saved totals dict (histories are restored in place)
+
+    Raises:
+        ValueError: If the file is empty, truncated, or not in this format
+            (histories are left untouched)
+    """
+    buffer = memoryview(path.read_bytes())
+    try:
+        magic, version, header_length = _HEADER.unpack_from(buffer, 0)
+    except struct.error:
+        raise ValueError(f"Usage file is empty or truncated ({len(buffer)} bytes)")
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported usage file format: {magic!r} v{version}")
+    offset = _HEADER.size
+    if offset + header_length > len(buffer):
+        raise ValueError("Usage file is truncated (incomplete header)")
+    header = json.loads(bytes(buffer[offset:offset + header_length]))
+    offset += header_length
+
+    # Check every column is complete before touching the histories, so a
+    # truncated file can't leave ring buffer columns out of alignment
+    expected_length = offset + sum(
+        array.array(typecode).itemsize * history_header["size"]
+        for history_header in header["histories"].values()
+        for _, typecode in history_header["columns"]
+    )
+    if expected_length != len(buffer):
+        raise ValueError(f"Usage file is truncated or corrupt "
+                         f"(expected {expected_length} bytes, found {len(buffer)})")
+
+    for name, history_header in header["histories"].items():
+        history = histories.get(name)
+        if history is None:
+            # Skip columns of a history this version doesn't know about
+            offset += sum(array.array(tc).itemsize * history_header["size"]
+                          for _, tc in history_header["columns"])
+            continue
+        offset = history._load(history_header, buffer, offset)
+    return header["totals"]
+
+
+def iso_to_epoch(value: Optional[str]) -> float:
+    """Parse a legacy ISO timestamp (0.0 if missing or invalid)"""
+    try:
+        return datetime.fromisoformat(value).timestamp() if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+def epoch_to_iso(value: float) -> str:
+    return datetime.fromtimestamp(value).isoformat()